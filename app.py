@@ -1,27 +1,40 @@
 import os
+import hmac
+import json
+import time
+import asyncio
 import datetime
+import contextvars
+import threading
+import importlib
+from collections import OrderedDict
 from typing import Annotated, List
 from dotenv import load_dotenv
-from fastapi import (FastAPI)
+from fastapi import (BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query, Request)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import (JSONResponse, PlainTextResponse, StreamingResponse)
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
+# The Azure OpenAI connector (openai SDK) and fetchurl (BeautifulSoup) are heavy to import,
+# they are imported where they are used so the server can start before they are loaded
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
-from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
 from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
-from semantic_kernel.connectors.ai.open_ai.prompt_execution_settings.azure_chat_prompt_execution_settings import (
-    AzureChatPromptExecutionSettings,
-)
 from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.function_call_content import FunctionCallContent
 from semantic_kernel.functions.kernel_arguments import KernelArguments
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 from semantic_kernel.kernel import Kernel
 
 # Import the refactored GitHub API
-from github_api import GitHubFile, GitHubActions
+from github_api import GitHubFile, GitHubActions, SessionPrefetcher, github_cache, resolve_cache_ttl
 
-from fetchurl import (get_content_from_url, extract_image_urls)
+from jobs import (JobQueue, QueueFullError)
+from concurrency import (AdmissionController, AdmissionRejected, KeyedLocks)
+from tool_selection import (ToolSelector, serialize_schema)
+from webhooks import (InvalidPayloadError, handle_event, verify_signature)
+from llm_pool import (Deployment, DeploymentPool, NoHealthyDeploymentError)
+from profiler import (LoopWatchdog, ProfilerBusyError, SamplingProfiler)
 
 app = FastAPI()
 
@@ -50,6 +63,10 @@ class PromptRequest(BaseModel):
 
 class Conversation(BaseModel):
     history: List[dict] = []
+    recent_tools: List[str] = []
+
+# Prefetcher of the conversation whose turn is running, set by _run_prompt when PREFETCH=on
+session_prefetcher = contextvars.ContextVar("session_prefetcher", default=None)
 
 class GithubPlugin:
     """Plugin provides github api """
@@ -59,6 +76,11 @@ class GithubPlugin:
         self.github_file = GitHubFile('', '')  # Initialize with empty strings
         self.github_actions = GitHubActions('', '')  # Initialize with empty strings
 
+    def _discard_prefetched(self, repo_owner, repo_name, path=None):
+        prefetcher = session_prefetcher.get()
+        if prefetcher is not None:
+            prefetcher.discard(repo_owner, repo_name, path)
+
     
     @kernel_function(name="github_list_files", description="List files in a github repo directory")
     def github_list_files(self, 
@@ -68,6 +90,9 @@ class GithubPlugin:
                     ) -> Annotated[str, "The output is a string containing a list of files"]:
         self.github_file = GitHubFile(repo_owner, repo_name)
         files = self.github_file.list_files(directory_path)
+        prefetcher = session_prefetcher.get()
+        if prefetcher is not None:
+            prefetcher.prefetch_tree(repo_owner, repo_name, files)
         return "\n".join(files)
     
     
@@ -78,27 +103,46 @@ class GithubPlugin:
                         file_path: Annotated[str, "file path"],
                         file_content: Annotated[str, "file content"],
                     ) -> Annotated[str, "The output is a string"]:
+        self._discard_prefetched(repo_owner, repo_name, file_path)
         self.github_file = GitHubFile(repo_owner, repo_name)
         commit_message = f"AI generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         return self.github_file.create_or_update_file(file_path, file_content, commit_message)
 
-    @kernel_function(name="github_push", description="Push file to github repo")
+    @kernel_function(name="github_push", description="Push full file content to github repo, for small changes to an existing file use github_apply_patch")
     def github_push(self, 
                         repo_owner: Annotated[str, "repository owner"],
                         repo_name: Annotated[str, "repository name"],
                         file_path: Annotated[str, "file path"],
                         file_content: Annotated[str, "full fixed file content"],
                     ) -> Annotated[str, "The output is a string"]:
+        self._discard_prefetched(repo_owner, repo_name, file_path)
         self.github_file = GitHubFile(repo_owner, repo_name)
         commit_message = f"AI updated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         return self.github_file.create_or_update_file(file_path, file_content, commit_message)
 
+    @kernel_function(name="github_apply_patch", description="Change an existing file in github repo by applying a unified diff or SEARCH/REPLACE blocks, without sending the full file content")
+    def github_apply_patch(self, 
+                        repo_owner: Annotated[str, "repository owner"],
+                        repo_name: Annotated[str, "repository name"],
+                        file_path: Annotated[str, "file path"],
+                        patch: Annotated[str, "unified diff of the file, or one or more blocks of the form '<<<<<<< SEARCH\\n<exact current lines>\\n=======\\n<new lines>\\n>>>>>>> REPLACE'"],
+                    ) -> Annotated[str, "The output is a string message indicating success or describing a conflict"]:
+        self._discard_prefetched(repo_owner, repo_name, file_path)
+        self.github_file = GitHubFile(repo_owner, repo_name)
+        commit_message = f"AI patched on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        return self.github_file.apply_patch(file_path, patch, commit_message)
+
     @kernel_function(name="github_get", description="Get file from github repo")
     def github_get(self, 
                         repo_owner: Annotated[str, "repository owner"],
                         repo_name: Annotated[str, "repository name"],
                         file_path: Annotated[str, "file path"],
                     ) -> Annotated[str, "The output is a string"]:
+        prefetcher = session_prefetcher.get()
+        if prefetcher is not None:
+            prefetched = prefetcher.get(repo_owner, repo_name, file_path)
+            if prefetched is not None:
+                return prefetched["content"]
         self.github_file = GitHubFile(repo_owner, repo_name)
         return self.github_file.get_file(file_path)["content"]
 
@@ -126,6 +170,7 @@ class GithubPlugin:
                         workflow_name: Annotated[str, "workflow file name"],
                         workflow_content: Annotated[str, "content of the workflow file"],
                     ) -> Annotated[str, "The output is a string"]:
+        self._discard_prefetched(repo_owner, repo_name, f".github/workflows/{workflow_name}")
         self.github_actions = GitHubActions(repo_owner, repo_name)
         return self.github_actions.create_or_update_workflow(workflow_name, workflow_content)
 
@@ -136,6 +181,7 @@ class GithubPlugin:
                         workflow_name: Annotated[str, "workflow file name"],
                         new_content: Annotated[str, "new content of the workflow file"],
                     ) -> Annotated[str, "The output is a string"]:
+        self._discard_prefetched(repo_owner, repo_name, f".github/workflows/{workflow_name}")
         self.github_actions = GitHubActions(repo_owner, repo_name)
         return self.github_actions.create_or_update_workflow(workflow_name, new_content)
 
@@ -145,7 +191,13 @@ class GithubPlugin:
                         repo_name: Annotated[str, "repository name"],
                     ) -> Annotated[str, "The output is a string"]:
         self.github_file = GitHubFile(repo_owner, repo_name)
-        return self.github_file.get_file('README.md')
+        readme = self.github_file.get_file('README.md')
+        prefetcher = session_prefetcher.get()
+        if prefetcher is not None:
+            # Files named in the README are likely to be read next
+            prefetcher.add_hints(readme['content'])
+            prefetcher.prefetch_repo(repo_owner, repo_name)
+        return readme
 
     @kernel_function(name="update_readme_on_github", description="Update existing Readme at repo, use only for Readme files")
     def update_readme_on_github(self, 
@@ -153,6 +205,7 @@ class GithubPlugin:
                         repo_name: Annotated[str, "repository name"],
                         file_content: Annotated[str, "full readme file content"],
                     ) -> Annotated[str, "The output is a string"]:
+        self._discard_prefetched(repo_owner, repo_name, 'README.md')
         self.github_file = GitHubFile(repo_owner, repo_name)
         return self.github_file.create_or_update_file('README.md', file_content, "Update README.md")
 
@@ -162,6 +215,7 @@ class GithubPlugin:
                         repo_name: Annotated[str, "repository name"],
                         file_content: Annotated[str, "full readme file content"],
                     ) -> Annotated[str, "The output is a string"]:
+        self._discard_prefetched(repo_owner, repo_name, 'README.md')
         self.github_file = GitHubFile(repo_owner, repo_name)
         return self.github_file.create_or_update_file('README.md', file_content, "Create README.md")
     
@@ -172,6 +226,7 @@ class GithubPlugin:
                         old_path: Annotated[str, "current file path"],
                         new_path: Annotated[str, "new file path"],
                     ) -> Annotated[str, "The output is a string message indicating success or describing an error"]:
+        self._discard_prefetched(repo_owner, repo_name)
         self.github_file = GitHubFile(repo_owner, repo_name)
         return self.github_file.rename_file(old_path, new_path)
 
@@ -182,6 +237,7 @@ class GithubPlugin:
                         old_path: Annotated[str, "current directory path"],
                         new_path: Annotated[str, "new directory path"],
                     ) -> Annotated[str, "The output is a string message indicating success or describing an error"]:
+        self._discard_prefetched(repo_owner, repo_name)
         self.github_file = GitHubFile(repo_owner, repo_name)
         return self.github_file.rename_directory(old_path, new_path)
     
@@ -191,10 +247,11 @@ class GithubPlugin:
                         repo_name: Annotated[str, "repository name"],
                         file_path: Annotated[str, "path of the file to delete"],
                     ) -> Annotated[str, "The output is a string message indicating success or describing an error"]:
+        self._discard_prefetched(repo_owner, repo_name, file_path)
         self.github_file = GitHubFile(repo_owner, repo_name)
         try:
             # First, get the file to retrieve its SHA
-            file_info = self.github_file.get_file(file_path)
+            file_info = self.github_file.get_file(file_path, use_cache=False)
             
             # Now delete the file
             commit_message = f"Delete file {file_path}"
@@ -207,14 +264,17 @@ class GithubPlugin:
     # The fetch utility functions:
     @kernel_function(name="github_get_html_content_from_url", description="Get html content from url")
     def github_get_html_content_from_url(self, url: Annotated[str, "The input url"]) -> Annotated[str, "The output is a string"]:
+        from fetchurl import get_content_from_url
         return get_content_from_url(url, 'html', 1000)
     
     @kernel_function(name="github_get_text_content_from_url", description="Get text only content from url")
     def github_get_text_content_from_url(self, url: Annotated[str, "The input url"]) -> Annotated[str, "The output is a string"]:
+        from fetchurl import get_content_from_url
         return get_content_from_url(url, 'text', 1000)
     
     @kernel_function(name="extract_image_urls", description="Get image only content from url")
     def extract_image_urls(self, url: Annotated[str, "The input url"]) -> Annotated[str, "The output is a list of url strings"]:
+        from fetchurl import extract_image_urls
         return extract_image_urls(url)
     
     @kernel_function(name="check_credentials_to_github", description="Check credentials to github")
@@ -231,13 +291,49 @@ class GithubPlugin:
         self.github_file = GitHubFile(owner, '')
         return self.github_file.list_repositories()
 
-# Global variable to store the kernel
+# Global variable to store the kernel, shared by all requests and job workers of this process
 kernel = None
+kernel_lock = asyncio.Lock()
+
+# Chat deployments the requests are routed to, built with the kernel
+llm_pool = None
+
+# Picks the tools offered on each turn, None when TOOL_SELECTION=off
+tool_selector = None
+
+# Speculative prefetchers per conversation, created only when PREFETCH=on, least recently used first
+prefetchers = OrderedDict()
+prefetch_evictions = {"sessions": 0, "wasted_bytes": 0}
+
+# Warm-up state reported by /ready
+warmup = {"status": "pending", "seconds": None, "error": None}
 
 # To store history:
 conversations = {}
 
+# Turns of one conversation run one at a time, in arrival order, with a bounded line per conversation
+conversation_locks = KeyedLocks(
+    timeout=float(os.getenv('CONVERSATION_QUEUE_TIMEOUT', '30')),
+    max_waiting=int(os.getenv('CONVERSATION_MAX_WAITING', '2')),
+)
+
+# Global cap on agent turns in flight, a slot covers every LLM round and tool call of a turn
+admission = AdmissionController(
+    limit=int(os.getenv('MAX_CONCURRENT_TURNS', '8')),
+    queue_timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '10')),
+    max_waiting=int(os.getenv('ADMISSION_MAX_WAITING', '32')),
+)
+
 async def setup_kernel():
+    # Importing the connector and building the client are blocking, keep them off the event loop
+    return await asyncio.to_thread(build_kernel)
+
+def build_kernel():
+    from openai import AsyncAzureOpenAI
+    from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+    from semantic_kernel.connectors.ai.open_ai.const import DEFAULT_AZURE_API_VERSION
+
+    global llm_pool
     kernel = Kernel()
     
     def get_env_var(var_name):
@@ -256,6 +352,9 @@ async def setup_kernel():
     azure_deployment_name = get_env_var('AZURE_OPENAI_CHAT_DEPLOYMENT_NAME')
     azure_endpoint = get_env_var('AZURE_OPENAI_ENDPOINT')
     azure_global_llm_service = get_env_var('GLOBAL_LLM_SERVICE')
+    # Optional JSON list of {"name", "deployment_name", "endpoint", "api_key", "tokens_per_minute"}
+    azure_deployments = get_env_var('AZURE_OPENAI_DEPLOYMENTS')
+    azure_api_version = get_env_var('AZURE_OPENAI_API_VERSION') or DEFAULT_AZURE_API_VERSION
     
     # Set environment variables
     if azure_api_key:
@@ -272,40 +371,125 @@ async def setup_kernel():
     if not github_api_key:
         raise ValueError("GITHUB_TOKEN_GEN_AI is not set. Please check your environment variables, .env file, or secret files.")
 
-    if not azure_endpoint:
+    if not azure_endpoint and not azure_deployments:
         raise ValueError("AZURE_OPENAI_ENDPOINT is not set. Please check your environment variables, .env file, or secret files.")
 
     if azure_global_llm_service != "AzureOpenAI":
         raise ValueError("This script is configured to use Azure OpenAI. Please check your .env file: GLOBAL_LLM_SERVICE")    
     
     
-    service_id = "function_calling"
-    
-    ai_service = AzureChatCompletion(
-        service_id=service_id,
-        deployment_name=azure_deployment_name,
-        endpoint=azure_endpoint,
-        api_key=azure_api_key
-    )
-    
-    kernel.add_service(ai_service)
+    if azure_deployments:
+        deployments = json.loads(azure_deployments)
+    else:
+        deployments = [{"name": "default", "deployment_name": azure_deployment_name, "endpoint": azure_endpoint}]
+
+    pool = []
+    for index, deployment in enumerate(deployments):
+        name = deployment.get("name") or f"deployment-{index}"
+        service_id = f"function_calling-{name}"
+
+        deployment_name = deployment.get("deployment_name") or azure_deployment_name
+        endpoint = deployment.get("endpoint") or azure_endpoint
+        api_key = deployment.get("api_key") or azure_api_key
+        # The pool fails over on 429 and 5xx, retries inside the openai client would only delay that
+        client = AsyncAzureOpenAI(
+            azure_endpoint=endpoint,
+            azure_deployment=deployment_name,
+            api_key=api_key,
+            api_version=azure_api_version,
+            max_retries=0,
+        )
+        ai_service = AzureChatCompletion(
+            service_id=service_id,
+            deployment_name=deployment_name,
+            endpoint=endpoint,
+            api_key=api_key,
+            api_version=azure_api_version,
+            async_client=client,
+        )
+
+        kernel.add_service(ai_service)
+        pool.append(Deployment(name, service_id, deployment.get("tokens_per_minute")))
+
+    llm_pool = DeploymentPool(pool, cooldown=float(os.getenv('LLM_COOLDOWN_SECONDS', '30')))
     kernel.add_plugin(GithubPlugin(), plugin_name="githubapi")
 
     return kernel
 
+def build_tool_schemas(kernel):
+    # Serialized once per kernel, only used to estimate the schema tokens of a selection
+    schemas = {}
+    for metadata in kernel.get_full_list_of_function_metadata():
+        parameters = [(param.name, param.schema_data or {"type": "string"}, param.is_required)
+                      for param in metadata.parameters]
+        schemas[metadata.name] = serialize_schema(metadata.fully_qualified_name, metadata.description or "", parameters)
+    return schemas
+
+async def get_kernel():
+    global kernel, tool_selector
+    if kernel is None:
+        async with kernel_lock:
+            if kernel is None:
+                new_kernel = await setup_kernel()
+                if os.getenv('TOOL_SELECTION', 'on') != 'off':
+                    tool_selector = ToolSelector(build_tool_schemas(new_kernel))
+                kernel = new_kernel
+    return kernel
+
+def get_prefetcher(conversation_id: str):
+    if os.getenv('PREFETCH', 'off') != 'on':
+        return None
+    if conversation_id not in prefetchers:
+        prefetchers[conversation_id] = SessionPrefetcher(
+            max_bytes=int(os.getenv('PREFETCH_MAX_BYTES', '2000000')),
+            max_files=int(os.getenv('PREFETCH_MAX_FILES', '20')),
+            max_age=float(os.getenv('PREFETCH_MAX_AGE', '60')),
+        )
+    prefetcher = prefetchers[conversation_id]
+    prefetchers.move_to_end(conversation_id)
+    while len(prefetchers) > int(os.getenv('PREFETCH_MAX_SESSIONS', '50')):
+        _, evicted = prefetchers.popitem(last=False)
+        prefetch_evictions["sessions"] += 1
+        prefetch_evictions["wasted_bytes"] += evicted.close()
+    return prefetcher
+
+def invalidate_prefetched(owner, repo, kind, ref, path):
+    # Webhook deliveries and writes made by any session drop the files prefetched by every session
+    for prefetcher in list(prefetchers.values()):
+        prefetcher.invalidate(owner, repo, kind, ref, path)
+
+github_cache.add_invalidation_listener(invalidate_prefetched)
+
 def get_or_create_conversation(conversation_id: str):
     if conversation_id not in conversations:
         conversations[conversation_id] = Conversation()
     return conversations[conversation_id]
 
-@app.on_event("startup")
-async def startup_event():
-    global kernel
-    kernel = await setup_kernel()
+def usage_tokens(message):
+    usage = message.metadata.get("usage")
+    return (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+
+def remember_used_tools(conversation: Conversation, history: ChatHistory, limit: int = 20):
+    # The auto-invoked tool calls of this turn are added to the chat history
+    for message in history.messages:
+        for item in message.items:
+            if isinstance(item, FunctionCallContent) and item.function_name:
+                if item.function_name in conversation.recent_tools:
+                    conversation.recent_tools.remove(item.function_name)
+                conversation.recent_tools.append(item.function_name)
+    del conversation.recent_tools[:-limit]
+
+async def run_prompt(conversation_id: str, prompt: str, blocking: bool = False):
+    async with conversation_locks.lock(conversation_id, blocking=blocking):
+        async with admission.admit(blocking=blocking):
+            return await _run_prompt(conversation_id, prompt)
+
+async def _run_prompt(conversation_id: str, prompt: str):
+    from semantic_kernel.connectors.ai.open_ai.prompt_execution_settings.azure_chat_prompt_execution_settings import (
+        AzureChatPromptExecutionSettings,
+    )
 
-@app.post("/demoprompt/{conversation_id}")
-async def demo_prompt(conversation_id: str, request: PromptRequest):
-    chat_completion : AzureChatCompletion = kernel.get_service(type=ChatCompletionClientBase)
+    kernel = await get_kernel()
     conversation = get_or_create_conversation(conversation_id)
     history = ChatHistory()
 
@@ -315,22 +499,271 @@ async def demo_prompt(conversation_id: str, request: PromptRequest):
         elif message['role'] == 'assistant':
             history.add_assistant_message(message['content'])
 
-    history.add_user_message(request.prompt)
+    history.add_user_message(prompt)
 
     execution_settings = AzureChatPromptExecutionSettings(tool_choice="auto")
-    execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto(auto_invoke=True, filters={})
+    filters = {}
+    selected = None
+    if tool_selector is not None:
+        recent_prompts = [message['content'] for message in conversation.history if message['role'] == 'user'][-2:]
+        selected = tool_selector.select(prompt, recent_prompts, conversation.recent_tools)
+        filters = {"included_functions": [f"githubapi-{name}" for name in selected]}
+    execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto(auto_invoke=True, filters=filters)
     
-    result = (await chat_completion.get_chat_message_contents(
-            chat_history=history,
-            settings=execution_settings,
-            kernel=kernel,
-            arguments=KernelArguments(),
-        ))[0]
+    async def complete(deployment: Deployment):
+        # On failover the next deployment gets the same history, which already holds
+        # the tool calls made so far, so the tool loop resumes instead of starting over
+        chat_completion = kernel.get_service(deployment.service_id, type=ChatCompletionClientBase)
+        start = len(history.messages)
+        results = []
+        try:
+            results = await chat_completion.get_chat_message_contents(
+                chat_history=history,
+                settings=execution_settings,
+                kernel=kernel,
+                arguments=KernelArguments(),
+            )
+            return results[0]
+        finally:
+            # Every round of the tool loop is a completion billed to this deployment, the
+            # assistant messages added to the history carry the usage of the earlier rounds
+            messages = history.messages[start:]
+            messages += [result for result in results if all(result is not message for message in messages)]
+            llm_pool.record_tokens(deployment, sum(usage_tokens(message) for message in messages))
+            if selected is not None:
+                # One request per assistant message, plus the request that failed if any
+                requests = sum(1 for message in messages if message.role == "assistant") + (0 if results else 1)
+                tool_selector.record_requests(selected, requests)
+
+    prefetcher = get_prefetcher(conversation_id)
+    if prefetcher is not None:
+        # Files named in the prompt are prefetched once the repository tree is known
+        prefetcher.add_hints(prompt)
+    token = session_prefetcher.set(prefetcher)
+    try:
+        result = await llm_pool.run(complete)
+    finally:
+        session_prefetcher.reset(token)
    
-    conversation.history.append({"role": "user", "content": request.prompt})
+    conversation.history.append({"role": "user", "content": prompt})
     conversation.history.append({"role": "assistant", "content": str(result)})
+    remember_used_tools(conversation, history)
+
+    return str(result)
+
+# On-demand profiling of this worker, and a detector for a blocked event loop
+profiler = SamplingProfiler()
+loop_watchdog = LoopWatchdog(threshold=float(os.getenv('LOOP_STALL_THRESHOLD', '0.5')))
+
+# Background jobs for long agent sessions, sized from the environment
+job_queue = JobQueue(
+    handler=lambda job: run_prompt(job.conversation_id, job.prompt, blocking=True),
+    workers=int(os.getenv('JOB_WORKERS', '4')),
+    max_depth=int(os.getenv('JOB_MAX_QUEUE_DEPTH', '100')),
+    max_tenant_depth=int(os.getenv('JOB_MAX_TENANT_QUEUE_DEPTH', '20')),
+)
+
+async def warm_up():
+    warmup["status"] = "warming_up"
+    started = time.perf_counter()
+    try:
+        await get_kernel()
+        # Load the fetch/parse stack as well so the first tool call does not pay for it
+        for module in ("fetchurl", "bs4"):
+            await asyncio.to_thread(importlib.import_module, module)
+    except Exception as e:
+        warmup["status"] = "failed"
+        warmup["error"] = str(e)
+        print(f"Kernel warm-up failed: {str(e)}")
+    else:
+        warmup["status"] = "ready"
+    warmup["seconds"] = round(time.perf_counter() - started, 3)
+
+def configure_github_cache():
+    # The webhook secret may only be in .env or a secret file, which the cache module does not read
+    load_dotenv()
+    secret = os.getenv('GITHUB_WEBHOOK_SECRET') or read_secret('GITHUB_WEBHOOK_SECRET')
+    github_cache.ttl = resolve_cache_ttl(os.getenv('GITHUB_CACHE_TTL'), secret)
+
+@app.on_event("startup")
+async def startup_event():
+    configure_github_cache()
+    # Warm up in the background so the server accepts connections right away. The loop
+    # only keeps a weak reference to tasks, keep ours so it is not collected mid-run.
+    app.state.warmup_task = asyncio.create_task(warm_up())
+    job_queue.start()
+    profiler.loop_thread_id = threading.get_ident()
+    if loop_watchdog.threshold > 0:
+        loop_watchdog.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    loop_watchdog.stop()
+    await job_queue.stop()
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(NoHealthyDeploymentError)
+async def no_healthy_deployment_handler(request, exc: NoHealthyDeploymentError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
-    return {"response": str(result)}
+@app.post("/demoprompt/{conversation_id}")
+async def demo_prompt(conversation_id: str, request: PromptRequest):
+    with profiler.track_request():
+        return {"response": await run_prompt(conversation_id, request.prompt)}
+
+@app.post("/jobs/{conversation_id}", status_code=202)
+async def submit_job(conversation_id: str, request: PromptRequest, x_tenant_id: str = Header(default="default")):
+    try:
+        job = await job_queue.submit(x_tenant_id, conversation_id, request.prompt)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs")
+async def get_jobs_stats():
+    return job_queue.stats()
+
+@app.get("/admission")
+async def get_admission_stats():
+    return {**admission.stats(), "conversations": conversation_locks.stats()}
+
+@app.get("/llm-pool")
+async def get_llm_pool_stats():
+    if llm_pool is None:
+        return {}
+    return llm_pool.stats()
+
+@app.get("/prefetch")
+async def get_prefetch_stats():
+    sessions = {conversation_id: prefetcher.stats() for conversation_id, prefetcher in prefetchers.items()}
+    hits = sum(stats["hits"] for stats in sessions.values())
+    lookups = hits + sum(stats["misses"] for stats in sessions.values())
+    return {
+        "enabled": os.getenv('PREFETCH', 'off') == 'on',
+        "hit_rate": round(hits / lookups, 3) if lookups else None,
+        "wasted_bytes": prefetch_evictions["wasted_bytes"] + sum(stats["wasted_bytes"] for stats in sessions.values()),
+        "max_sessions": int(os.getenv('PREFETCH_MAX_SESSIONS', '50')),
+        "evicted_sessions": prefetch_evictions["sessions"],
+        "sessions": sessions,
+    }
+
+@app.get("/tool-selection")
+async def get_tool_selection_stats():
+    if tool_selector is None:
+        return {"enabled": False}
+    return {"enabled": True, **tool_selector.stats()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        # Send the current state right away, then a heartbeat until the job ends
+        yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+        while not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+        yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def prewarm_github_cache(targets):
+    for target in targets:
+        try:
+            github_file = GitHubFile(target["owner"], target["repo"])
+            if target["kind"] == "tree":
+                github_file.list_files(branch=target["ref"])
+            else:
+                github_file.get_file(target["path"], target["ref"], use_cache=False)
+        except Exception as e:
+            print(f"Pre-warming {target['kind']} of {target['owner']}/{target['repo']} failed: {str(e)}")
+
+@app.post("/webhooks/github")
+async def github_webhook(request: Request, background_tasks: BackgroundTasks,
+                         x_github_event: str = Header(default=""),
+                         x_hub_signature_256: str = Header(default="")):
+    secret = os.getenv('GITHUB_WEBHOOK_SECRET') or read_secret('GITHUB_WEBHOOK_SECRET')
+    if not secret:
+        raise HTTPException(status_code=503, detail="GITHUB_WEBHOOK_SECRET is not set")
+
+    body = await request.body()
+    if not verify_signature(secret, body, x_hub_signature_256):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid webhook payload: {str(e)}")
+    try:
+        result = handle_event(x_github_event, payload, github_cache)
+    except InvalidPayloadError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid webhook payload: {str(e)}")
+    if result["prewarm"]:
+        background_tasks.add_task(prewarm_github_cache, result["prewarm"])
+    return result
+
+@app.get("/github-cache")
+async def get_github_cache_stats():
+    return github_cache.stats()
+
+def require_admin(authorization: str = Header(default="")):
+    admin_token = os.getenv('ADMIN_TOKEN') or read_secret('ADMIN_TOKEN')
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled, set ADMIN_TOKEN")
+    if not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {admin_token}".encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+async def profile_worker(seconds: float = Query(default=10, gt=0, le=120)):
+    try:
+        return await asyncio.to_thread(profiler.profile, seconds)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def profile_next_requests(count: int = Query(default=1, gt=0, le=100)):
+    try:
+        profiler.arm(count)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.status()
+
+@app.get("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def get_requests_profile():
+    if profiler.last_capture is None:
+        return JSONResponse(status_code=202, content=profiler.status())
+    return PlainTextResponse(profiler.last_capture)
+
+@app.get("/admin/loop-stalls", dependencies=[Depends(require_admin)])
+async def get_loop_stalls():
+    return loop_watchdog.stats()
+
+@app.get("/ready")
+async def ready():
+    status_code = 200 if warmup["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=warmup)
 
 @app.get("/")
 async def read_root():
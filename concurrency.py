@@ -0,0 +1,148 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted, retry_after is a hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps the number of agent turns in flight across the whole process. A slot is
+    held for a whole turn, every round of the tool loop and the GitHub calls the
+    tools make included, not for single chat completion requests.
+
+    Callers beyond the limit wait in line for at most queue_timeout seconds.
+    When max_waiting callers are already in line, new callers are rejected
+    right away instead of piling up behind them.
+    """
+
+    def __init__(self, limit=8, queue_timeout=10.0, max_waiting=32):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max_waiting
+        self._semaphore = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._rejected = 0
+        self._avg_duration = 1.0
+
+    def _retry_after(self):
+        # Rough time for the queue ahead of us to drain, at least one second
+        return max(1, math.ceil(self._avg_duration * (self._waiting + 1) / self.limit))
+
+    @asynccontextmanager
+    async def admit(self, blocking=False):
+        """
+        Hold one of the slots for the duration of the block.
+
+        Args:
+        blocking (bool): Wait for a slot without a timeout and without the
+            max_waiting check, for callers that are already bounded (job workers).
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+
+        if self._semaphore.locked() and not blocking and self._waiting >= self.max_waiting:
+            self._rejected += 1
+            raise AdmissionRejected("Too many requests in flight", self._retry_after())
+
+        self._waiting += 1
+        try:
+            if blocking:
+                await self._semaphore.acquire()
+            else:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise AdmissionRejected("Timed out waiting for a free slot", self._retry_after())
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+            "avg_duration": round(self._avg_duration, 3),
+        }
+
+
+class KeyedLocks:
+    """
+    One asyncio.Lock per key (e.g. conversation id), dropped once nobody holds or waits on it.
+
+    Non-blocking callers wait at most timeout seconds, and are rejected right away
+    when max_waiting callers already wait on the same key.
+    """
+
+    def __init__(self, timeout=None, max_waiting=None):
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self._locks = {}
+        self._users = {}
+        self._rejected = 0
+
+    @asynccontextmanager
+    async def lock(self, key, blocking=False):
+        """
+        Args:
+        blocking (bool): Wait without a timeout and without the max_waiting check.
+        """
+        lock = self._locks.get(key)
+        if lock is not None and lock.locked() and not blocking and self.max_waiting is not None:
+            # The holder is one of the users, the rest are waiting
+            if self._users[key] - 1 >= self.max_waiting:
+                self._rejected += 1
+                raise AdmissionRejected("Too many requests queued for this conversation", self._retry_after())
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            try:
+                if blocking or self.timeout is None:
+                    await lock.acquire()
+                else:
+                    await asyncio.wait_for(lock.acquire(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self._rejected += 1
+                raise AdmissionRejected("Timed out waiting for the previous turn of this conversation",
+                                        self._retry_after())
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def _retry_after(self):
+        return max(1, math.ceil(self.timeout)) if self.timeout else 1
+
+    def stats(self):
+        return {
+            "active_keys": len(self._locks),
+            "waiting": sum(users - 1 for key, users in self._users.items() if self._locks[key].locked()),
+            "rejected": self._rejected,
+        }
+
+    def __len__(self):
+        return len(self._locks)
@@ -1,7 +1,8 @@
 import requests
-from bs4 import BeautifulSoup
 from typing import Optional
 
+# BeautifulSoup is imported inside the functions, it is only needed once a page is parsed
+
 
 
 def get_content_from_url(url: str, content_type: str = 'html', max_length: Optional[int] = None) -> str:
@@ -21,6 +22,7 @@ def get_content_from_url(url: str, content_type: str = 'html', max_length: Optio
     try:
         response = requests.get(url, headers=headers, timeout=10)
         response.raise_for_status()  # Raises an HTTPError for bad responses
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(response.text, 'html.parser')
         
         if content_type == 'html':
@@ -70,6 +72,7 @@ def extract_image_urls(url):
         return str(e)
 
 
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(response.text, 'html.parser')
     img_tags = soup.find_all('img')
     
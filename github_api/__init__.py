@@ -1,4 +1,7 @@
 from .files import GitHubFile
 from .actions import GitHubActions
+from .patch import PatchConflictError
+from .cache import (GitHubCache, github_cache, resolve_cache_ttl)
+from .prefetch import SessionPrefetcher
 
-__all__ = ['GitHubFile', 'GitHubActions']
\ No newline at end of file
+__all__ = ['GitHubFile', 'GitHubActions', 'PatchConflictError', 'GitHubCache', 'github_cache', 'resolve_cache_ttl', 'SessionPrefetcher']
\ No newline at end of file
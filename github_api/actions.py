@@ -1,6 +1,7 @@
 import requests
 from .auth import get_github_token
 from .utils import (make_github_request,encode_content)
+from .cache import github_cache
 import zipfile
 import io
 import os
@@ -20,6 +21,10 @@ class GitHubActions:
         }
 
     def get_actions_results(self, artifact_name="SummaryResult"):
+        cached = github_cache.get("artifact", self.owner, self.repo, path=artifact_name)
+        if cached is not None:
+            return cached
+
         artifacts_url = f"{self.base_url}/actions/artifacts"
         artifacts = make_github_request("GET", artifacts_url, self._get_headers())["artifacts"]
 
@@ -40,6 +45,7 @@ class GitHubActions:
         os.remove("temp_artifact/summary.md")
         os.rmdir("temp_artifact")
 
+        github_cache.set("artifact", self.owner, self.repo, path=artifact_name, value=content)
         return content
 
     def create_or_update_workflow(self, workflow_name, workflow_content, branch="main"):
@@ -58,4 +64,7 @@ class GitHubActions:
         except requests.exceptions.HTTPError:
             pass  # Workflow doesn't exist, creating new workflow
 
-        return make_github_request("PUT", url, self._get_headers(), data)
+        response = make_github_request("PUT", url, self._get_headers(), data)
+        github_cache.invalidate(self.owner, self.repo, kind="tree", ref=branch)
+        github_cache.invalidate(self.owner, self.repo, kind="content", ref=branch, path=file_path)
+        return response
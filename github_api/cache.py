@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds entries are kept when a webhook keeps the cache fresh
+DEFAULT_TTL = 60.0
+
+
+class GitHubCache:
+    """
+    In-memory LRU cache for GitHub trees, file contents and action artifacts.
+
+    Entries are keyed by (kind, owner, repo, ref, path) and expire after ttl
+    seconds. Writes done through github_api and GitHub webhooks invalidate
+    entries as soon as they change, the ttl only bounds staleness when a
+    change is missed.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._listeners = []
+
+    @staticmethod
+    def _key(kind, owner, repo, ref=None, path=None):
+        # Owner and repository names are case-insensitive on GitHub
+        return (kind, owner.lower(), repo.lower(), ref, path)
+
+    def get(self, kind, owner, repo, ref=None, path=None):
+        key = self._key(kind, owner, repo, ref, path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, kind, owner, repo, ref=None, path=None, value=None):
+        if self.ttl <= 0:
+            return
+        key = self._key(kind, owner, repo, ref, path)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add_invalidation_listener(self, listener):
+        """
+        Call listener(owner, repo, kind, ref, path) on every invalidation, so caches
+        kept outside this one (session prefetchers) drop the same entries.
+        """
+        self._listeners.append(listener)
+
+    def invalidate(self, owner, repo, kind=None, ref=None, path=None):
+        """
+        Drop the entries of a repository, optionally narrowed down by kind, ref and path.
+
+        Returns:
+        int: Number of dropped entries.
+        """
+        owner, repo = owner.lower(), repo.lower()
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[1] == owner and key[2] == repo
+                and (kind is None or key[0] == kind)
+                and (ref is None or key[3] == ref)
+                and (path is None or key[4] == path)
+            ]
+            for key in keys:
+                del self._entries[key]
+            self._invalidations += len(keys)
+        for listener in self._listeners:
+            listener(owner, repo, kind, ref, path)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+        }
+
+
+def resolve_cache_ttl(ttl=None, webhook_secret=None):
+    """
+    Cache TTL from the GITHUB_CACHE_TTL setting. Without a webhook nothing reports changes
+    made outside the app, so by default entries are only cached when a webhook secret is set.
+    """
+    if ttl:
+        return float(ttl)
+    return DEFAULT_TTL if webhook_secret else 0.0
+
+
+# Shared by every GitHubFile and GitHubActions instance, GITHUB_CACHE_TTL=0 disables caching
+github_cache = GitHubCache(ttl=resolve_cache_ttl(os.getenv('GITHUB_CACHE_TTL'), os.getenv('GITHUB_WEBHOOK_SECRET')))
@@ -2,6 +2,8 @@ import base64
 import requests
 from .auth import get_github_token
 from .utils import (encode_content, make_github_request)
+from .patch import (apply_patch, PatchConflictError)
+from .cache import github_cache
 
 class GitHubFile:
     def __init__(self, owner, repo):
@@ -17,16 +19,28 @@ class GitHubFile:
             "Content-Type": "application/vnd.github+json",
         }
 
-    def get_file(self, file_path, branch="main"):
+    def get_file(self, file_path, branch="main", use_cache=True):
+        if use_cache:
+            cached = github_cache.get("content", self.owner, self.repo, branch, file_path)
+            if cached is not None:
+                return dict(cached)
+
         url = f"{self.base_url}/{file_path}"
         params = {"ref": branch}
         response = make_github_request("GET", url, self._get_headers(), params)
         content = base64.b64decode(response['content']).decode('utf-8')
         sha = response['sha']
-        return {
+        file = {
             "content": content,
             "sha": sha
         }
+        github_cache.set("content", self.owner, self.repo, branch, file_path, file)
+        return dict(file)
+
+    def _invalidate(self, file_path=None, branch="main"):
+        # The tree changes with any write, the content only for the written path
+        github_cache.invalidate(self.owner, self.repo, kind="tree", ref=branch)
+        github_cache.invalidate(self.owner, self.repo, kind="content", ref=branch, path=file_path)
 
     def create_or_update_file(self, file_path, content, commit_message, branch="main"):
         url = f"{self.base_url}/{file_path}"
@@ -37,13 +51,58 @@ class GitHubFile:
         }
 
         try:
-            existing_file = self.get_file(file_path, branch)
+            existing_file = self.get_file(file_path, branch, use_cache=False)
             data['sha'] = existing_file['sha']
             
         except requests.exceptions.HTTPError:
             pass  # File doesn't exist, creating new file
 
-        return make_github_request("PUT", url, self._get_headers(), data)
+        response = make_github_request("PUT", url, self._get_headers(), data)
+        self._invalidate(file_path, branch)
+        return response
+
+    def apply_patch(self, file_path, patch, commit_message, branch="main"):
+        """
+        Apply a unified diff or SEARCH/REPLACE edits to a file and commit the result.
+
+        The update is sent with the SHA of the blob the patch was applied to, so
+        GitHub rejects it if the file changed in the meantime.
+        """
+        # The first attempt may use cached content, a conflict retries once against a fresh read
+        for use_cache in (True, False):
+            try:
+                current = self.get_file(file_path, branch, use_cache=use_cache)
+                patched, edits = apply_patch(current['content'], patch)
+            except PatchConflictError as e:
+                if use_cache:
+                    self._invalidate(file_path, branch)
+                    continue
+                return f"Patch conflict in {file_path}: {str(e)}"
+            except requests.exceptions.HTTPError as e:
+                return f"Error reading {file_path}: {str(e)}"
+
+            if patched == current['content']:
+                return f"Patch made no changes to {file_path}"
+
+            url = f"{self.base_url}/{file_path}"
+            data = {
+                "message": commit_message,
+                "content": encode_content(patched),
+                "sha": current['sha'],
+                "branch": branch
+            }
+            try:
+                response = make_github_request("PUT", url, self._get_headers(), data)
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code == 409:
+                    self._invalidate(file_path, branch)
+                    if use_cache:
+                        continue
+                    return f"Patch conflict in {file_path}: the file changed since it was read, get it again and retry"
+                return f"Error committing {file_path}: {str(e)}"
+
+            self._invalidate(file_path, branch)
+            return f"Applied {edits} edit(s) to {file_path} in commit {response['commit']['sha']}"
 
     
     def create_directory(self, directory_path, branch="main"):
@@ -55,19 +114,22 @@ class GitHubFile:
         )
     
     def list_files(self, path="", branch="main"):
-        base_url  = (f"{self.base_url}")
-        url = f"{base_url[:-9]}/git/trees/{branch}?recursive=1"        
+        all_files = github_cache.get("tree", self.owner, self.repo, branch)
+        if all_files is None:
+            base_url  = (f"{self.base_url}")
+            url = f"{base_url[:-9]}/git/trees/{branch}?recursive=1"        
 
-        response = make_github_request("GET", url, self._get_headers())
-        
-        all_files = []
-        for item in response['tree']:
-            if item['type'] == 'blob':  # 'blob' represents a file
-                all_files.append(item['path'])
+            response = make_github_request("GET", url, self._get_headers())
+            
+            all_files = []
+            for item in response['tree']:
+                if item['type'] == 'blob':  # 'blob' represents a file
+                    all_files.append(item['path'])
+            github_cache.set("tree", self.owner, self.repo, branch, None, all_files)
         
         if path:
             return [file for file in all_files if file.startswith(path)]
-        return all_files
+        return list(all_files)
     
 
     def rename_file(self, old_path, new_path, commit_message=None, branch="main"):
@@ -129,6 +191,7 @@ class GitHubFile:
                 "sha": new_commit_response['sha']
             }
             make_github_request("PATCH", ref_url, self._get_headers(), ref_data)
+            github_cache.invalidate(self.owner, self.repo, ref=branch)
 
             return f"Successfully renamed file from {old_path} to {new_path}"
 
@@ -200,6 +263,7 @@ class GitHubFile:
                 "sha": new_commit_response['sha']
             }
             make_github_request("PATCH", ref_url, self._get_headers(), ref_data)
+            github_cache.invalidate(self.owner, self.repo, ref=branch)
 
             return f"Successfully renamed directory from {old_path} to {new_path}"
 
@@ -215,6 +279,8 @@ class GitHubFile:
         }
         response = requests.delete(url, headers=self._get_headers(), json=data)
         response.raise_for_status()
+        github_cache.invalidate(self.owner, self.repo, kind="tree")
+        github_cache.invalidate(self.owner, self.repo, kind="content", path=file_path)
         return response.json()
     
     
@@ -0,0 +1,184 @@
+import re
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+SEARCH_MARKER = "<<<<<<< SEARCH"
+DIVIDER_MARKER = "======="
+REPLACE_MARKER = ">>>>>>> REPLACE"
+
+
+class PatchConflictError(ValueError):
+    """Raised when a patch does not apply cleanly to the current file content."""
+
+
+def is_search_replace(patch):
+    return SEARCH_MARKER in patch
+
+
+def parse_unified_diff(diff):
+    """
+    Parse the hunks of a single-file unified diff.
+
+    A hunk ends once the line counts of its header are reached, so text around
+    the hunks (a markdown fence, an explanation) is ignored.
+
+    Returns:
+    list: One dict per hunk with the 1-based old start line, the old line count and the old and new lines.
+    """
+    hunks = []
+    current = None
+    old_left = new_left = 0
+    lines = diff.splitlines()
+    for index, line in enumerate(lines):
+        if line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            if not match:
+                raise PatchConflictError(f"Invalid hunk header: {line}")
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            old_left = count
+            new_left = int(match.group(4)) if match.group(4) is not None else 1
+            current = {"start": int(match.group(1)), "count": count, "old": [], "new": []}
+            hunks.append(current)
+        elif current is None or line.startswith("\\"):
+            # Outside of a hunk, or "\ No newline at end of file"
+            next_line = lines[index + 1] if index + 1 < len(lines) else ""
+            if hunks and (line.startswith("diff --git ") or (line.startswith("--- ") and next_line.startswith("+++ "))):
+                raise PatchConflictError("The diff changes more than one file, send one diff per file")
+        elif line.startswith("-") and old_left:
+            current["old"].append(line[1:])
+            old_left -= 1
+        elif line.startswith("+") and new_left:
+            current["new"].append(line[1:])
+            new_left -= 1
+        elif line[:1] in (" ", "") and old_left and new_left:
+            # Context line, some tools strip the leading space of empty lines
+            current["old"].append(line[1:])
+            current["new"].append(line[1:])
+            old_left -= 1
+            new_left -= 1
+        else:
+            raise PatchConflictError(f"Unexpected line in hunk {len(hunks)}: {line}")
+
+        if current is not None and not old_left and not new_left:
+            current = None
+
+    if not hunks:
+        raise PatchConflictError("The diff does not contain any hunks")
+    return hunks
+
+
+def _find_hunk(lines, old, expected, search_from):
+    if not old:
+        return min(max(expected, search_from), len(lines))
+
+    if lines[expected:expected + len(old)] == old and expected >= search_from:
+        return expected
+
+    # The line numbers may be off, accept the match closest to where the hunk claims to be
+    matches = [i for i in range(search_from, len(lines) - len(old) + 1) if lines[i:i + len(old)] == old]
+    if not matches:
+        return None
+    return min(matches, key=lambda i: abs(i - expected))
+
+
+def apply_unified_diff(content, diff):
+    """
+    Apply a single-file unified diff to content.
+
+    Returns:
+    tuple: The patched content and the number of applied hunks.
+    """
+    hunks = parse_unified_diff(diff)
+    ends_with_newline = content.endswith("\n")
+    lines = content.split("\n")
+    if ends_with_newline:
+        lines.pop()
+
+    offset = 0
+    search_from = 0
+    for number, hunk in enumerate(hunks, start=1):
+        if hunk["count"] == 0:
+            # Pure insertion, the start line is the one the new lines go after
+            expected = hunk["start"] + offset
+        else:
+            expected = max(hunk["start"] - 1, 0) + offset
+        position = _find_hunk(lines, hunk["old"], expected, search_from)
+        if position is None:
+            raise PatchConflictError(
+                f"Hunk {number} (line {hunk['start']}) does not match the current file content"
+            )
+        lines[position:position + len(hunk["old"])] = hunk["new"]
+        offset += len(hunk["new"]) - len(hunk["old"])
+        search_from = position + len(hunk["new"])
+
+    patched = "\n".join(lines)
+    if ends_with_newline or (lines and not content):
+        patched += "\n"
+    return patched, len(hunks)
+
+
+def parse_search_replace(patch):
+    """
+    Parse SEARCH/REPLACE edit blocks:
+
+        <<<<<<< SEARCH
+        old text
+        =======
+        new text
+        >>>>>>> REPLACE
+
+    Returns:
+    list: (search, replace) tuples in the order they appear.
+    """
+    edits = []
+    state = None
+    search, replace = [], []
+    for line in patch.splitlines():
+        stripped = line.rstrip()
+        if stripped == SEARCH_MARKER and state is None:
+            state, search, replace = "search", [], []
+        elif stripped == DIVIDER_MARKER and state == "search":
+            state = "replace"
+        elif stripped == REPLACE_MARKER and state == "replace":
+            edits.append(("\n".join(search), "\n".join(replace)))
+            state = None
+        elif state == "search":
+            search.append(line)
+        elif state == "replace":
+            replace.append(line)
+
+    if state is not None:
+        raise PatchConflictError("Unterminated SEARCH/REPLACE block")
+    if not edits:
+        raise PatchConflictError("The patch does not contain any SEARCH/REPLACE blocks")
+    return edits
+
+
+def apply_search_replace(content, patch):
+    """
+    Apply SEARCH/REPLACE edit blocks to content, each search text must occur exactly once.
+
+    Returns:
+    tuple: The patched content and the number of applied edits.
+    """
+    edits = parse_search_replace(patch)
+    for number, (search, replace) in enumerate(edits, start=1):
+        if not search:
+            raise PatchConflictError(f"Edit {number} has an empty SEARCH section")
+        count = content.count(search)
+        if count == 0:
+            raise PatchConflictError(f"Edit {number}: SEARCH text not found in the current file content")
+        if count > 1:
+            raise PatchConflictError(
+                f"Edit {number}: SEARCH text occurs {count} times, include more context to make it unique"
+            )
+        content = content.replace(search, replace, 1)
+    return content, len(edits)
+
+
+def apply_patch(content, patch):
+    """
+    Apply either SEARCH/REPLACE blocks or a unified diff, detected from the patch text.
+    """
+    if is_search_replace(patch):
+        return apply_search_replace(content, patch)
+    return apply_unified_diff(content, patch)
@@ -0,0 +1,224 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .files import GitHubFile
+
+ENTRY_POINTS = ("main.py", "app.py", "__main__.py", "manage.py", "server.py", "index.js", "server.js",
+                "main.go", "main.rs", "lib.rs")
+CONFIG_FILES = ("requirements.txt", "pyproject.toml", "setup.py", "setup.cfg", "tox.ini", "package.json",
+                "Dockerfile", "docker-compose.yml", "go.mod", "Cargo.toml", "Makefile")
+WORKFLOW_DIR = ".github/workflows/"
+
+# Shared by every session, the fetches are blocking requests calls
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('PREFETCH_WORKERS', '4')), thread_name_prefix="prefetch")
+
+
+def rank_candidates(paths, hints="", max_files=20):
+    """
+    Pick the files of a tree that are likely to be read next.
+
+    Files named in the hints (prompt, README) come first, then workflow files
+    (what failing actions run), then top-level entry points and configs.
+
+    Returns:
+    list: At most max_files paths, most likely first.
+    """
+    tokens = {token.rstrip(".") for token in re.findall(r"[\w./-]+", hints)}
+    ranked = []
+    for path in paths:
+        name = path.rsplit("/", 1)[-1]
+        depth = path.count("/")
+        if path in tokens or ("." in name and name in tokens):
+            priority = 0
+        elif path.startswith(WORKFLOW_DIR):
+            priority = 1
+        elif name in ENTRY_POINTS and depth <= 1:
+            priority = 2
+        elif name in CONFIG_FILES and depth == 0:
+            priority = 3
+        else:
+            continue
+        ranked.append((priority, depth, path))
+    return [path for _, _, path in sorted(ranked)[:max_files]]
+
+
+class _Prefetched:
+    def __init__(self):
+        self.future = None
+        self.size = 0
+        self.fetched_at = None
+        self.served = False
+
+
+class SessionPrefetcher:
+    """
+    Fetches the files a session is likely to read next into a per-session cache,
+    while the model is still thinking, so later github_get calls are served locally.
+
+    The cache is bounded by max_bytes, files that do not fit are not kept. Files
+    are served for at most max_age seconds after they were fetched, and are
+    dropped earlier by discard and invalidate.
+    """
+
+    def __init__(self, max_bytes=2_000_000, max_files=20, branch="main", wait_timeout=10.0, max_age=60.0):
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.branch = branch
+        self.wait_timeout = wait_timeout
+        self.max_age = max_age
+        self.hints = ""
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._bytes = 0
+        self._prefetched = 0
+        self._skipped = 0
+        self._expired = 0
+        self._hits = 0
+        self._misses = 0
+        self._wasted_bytes = 0
+
+    @staticmethod
+    def _key(owner, repo, path):
+        return (owner.lower(), repo.lower(), path)
+
+    def _is_expired(self, entry, now):
+        return entry.fetched_at is not None and now - entry.fetched_at > self.max_age
+
+    def _drop(self, key):
+        # Caller holds the lock
+        entry = self._entries.pop(key)
+        entry.future.cancel()
+        self._bytes -= entry.size
+        if not entry.served:
+            self._wasted_bytes += entry.size
+
+    def add_hints(self, text, limit=20000):
+        # Keep the latest text only, it is scanned for file names on every prefetch
+        self.hints = f"{self.hints}\n{text}"[-limit:]
+
+    def prefetch(self, owner, repo, paths):
+        now = time.monotonic()
+        with self._lock:
+            for path in paths:
+                key = self._key(owner, repo, path)
+                entry = self._entries.get(key)
+                if entry is not None and self._is_expired(entry, now):
+                    self._drop(key)
+                    entry = None
+                if entry is None and self._bytes < self.max_bytes:
+                    entry = _Prefetched()
+                    self._entries[key] = entry
+                    entry.future = _executor.submit(self._fetch, owner, repo, path, entry)
+
+    def prefetch_tree(self, owner, repo, paths):
+        self.prefetch(owner, repo, rank_candidates(paths, self.hints, self.max_files))
+
+    def prefetch_repo(self, owner, repo):
+        """List the tree in the background (through the github_api cache) and prefetch from it."""
+        _executor.submit(self._prefetch_repo, owner, repo)
+
+    def _prefetch_repo(self, owner, repo):
+        try:
+            self.prefetch_tree(owner, repo, GitHubFile(owner, repo).list_files(branch=self.branch))
+        except Exception as e:
+            print(f"Prefetching {owner}/{repo} failed: {str(e)}")
+
+    def _fetch(self, owner, repo, path, entry):
+        key = self._key(owner, repo, path)
+        try:
+            file = GitHubFile(owner, repo).get_file(path, self.branch)
+        except Exception as e:
+            # Forget the entry so a later listing can prefetch the path again
+            print(f"Prefetching {owner}/{repo}/{path} failed: {str(e)}")
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    self._skipped += 1
+            return None
+        size = len(file["content"].encode("utf-8"))
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                # Discarded while the fetch was running, the content may already be stale
+                return None
+            if self._bytes + size > self.max_bytes:
+                del self._entries[key]
+                self._skipped += 1
+                return None
+            entry.size = size
+            entry.fetched_at = time.monotonic()
+            self._bytes += size
+            self._prefetched += 1
+        return file
+
+    def get(self, owner, repo, path):
+        """
+        Returns:
+        dict: The prefetched file ({"content", "sha"}), waiting for an in-flight fetch, or None.
+        """
+        key = self._key(owner, repo, path)
+        with self._lock:
+            entry = self._entries.get(key)
+        try:
+            file = entry.future.result(timeout=self.wait_timeout) if entry is not None else None
+        except Exception:
+            file = None
+
+        with self._lock:
+            if file is not None and self._entries.get(key) is not entry:
+                file = None  # Discarded while waiting
+            elif file is not None and self._is_expired(entry, time.monotonic()):
+                self._drop(key)
+                self._expired += 1
+                file = None
+            if file is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            entry.served = True
+        return dict(file)
+
+    def discard(self, owner, repo, path=None):
+        """Drop prefetched files after a write, a whole repository when path is None."""
+        owner, repo = owner.lower(), repo.lower()
+        with self._lock:
+            keys = [key for key in self._entries
+                    if key[0] == owner and key[1] == repo and (path is None or key[2] == path)]
+            for key in keys:
+                self._drop(key)
+
+    def invalidate(self, owner, repo, kind=None, ref=None, path=None):
+        """Follow an invalidation of the github_api cache, only file contents of our branch are kept here."""
+        if kind in (None, "content") and ref in (None, self.branch):
+            self.discard(owner, repo, path)
+
+    def close(self):
+        """
+        Drop every prefetched file, when the session is evicted.
+
+        Returns:
+        int: Bytes that were prefetched but never read.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+            return self._wasted_bytes
+
+    def stats(self):
+        with self._lock:
+            unserved = sum(entry.size for entry in self._entries.values() if not entry.served)
+            lookups = self._hits + self._misses
+            return {
+                "prefetched_files": self._prefetched,
+                # Over the byte budget, or the fetch failed
+                "skipped": self._skipped,
+                "expired": self._expired,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "wasted_bytes": self._wasted_bytes + unserved,
+            }
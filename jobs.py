@@ -0,0 +1,161 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue, or the tenant's share of it, is full."""
+
+
+class Job:
+    def __init__(self, tenant, conversation_id, prompt):
+        self.id = uuid.uuid4().hex
+        self.tenant = tenant
+        self.conversation_id = conversation_id
+        self.prompt = prompt
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = asyncio.Event()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "tenant": self.tenant,
+            "conversation_id": self.conversation_id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Bounded queue of prompt jobs served by a fixed pool of async workers.
+
+    Jobs are kept in one FIFO per tenant and the workers take from the tenants
+    in round-robin order, so a tenant that submits a burst of jobs cannot
+    starve the others. Jobs of a conversation that already has a running job
+    stay queued, so they do not tie up workers waiting for it.
+    """
+
+    def __init__(self, handler, workers=4, max_depth=100, max_tenant_depth=20, max_finished=1000):
+        """
+        Args:
+        handler: Coroutine function called with a Job, its return value becomes the job result.
+        workers (int): Number of jobs that may run at the same time.
+        max_depth (int): Maximum number of queued (not yet started) jobs.
+        max_tenant_depth (int): Maximum number of queued jobs of a single tenant.
+        max_finished (int): Number of finished jobs kept around for polling.
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_tenant_depth = max_tenant_depth
+        self.max_finished = max_finished
+        self._tenants = OrderedDict()
+        self._jobs = {}
+        self._finished = deque()
+        self._queued = 0
+        self._running = 0
+        self._running_conversations = set()
+        self._condition = None
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._condition = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, tenant, conversation_id, prompt):
+        if self._queued >= self.max_depth:
+            raise QueueFullError(f"Job queue is full ({self.max_depth} jobs queued)")
+        if len(self._tenants.get(tenant, ())) >= self.max_tenant_depth:
+            raise QueueFullError(f"Too many jobs queued for tenant {tenant} ({self.max_tenant_depth})")
+
+        self.start()
+        job = Job(tenant, conversation_id, prompt)
+        self._jobs[job.id] = job
+        self._tenants.setdefault(tenant, deque()).append(job)
+        self._queued += 1
+
+        async with self._condition:
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queued,
+            "max_depth": self.max_depth,
+            "max_tenant_depth": self.max_tenant_depth,
+            "tenants": {tenant: len(jobs) for tenant, jobs in self._tenants.items()},
+        }
+
+    def _next_job(self):
+        # Take the first job of the first tenant whose conversation is not running, and rotate
+        # that tenant to the back. Returns None when every queued job waits on its conversation.
+        for tenant, jobs in self._tenants.items():
+            job = next((job for job in jobs if job.conversation_id not in self._running_conversations), None)
+            if job is None:
+                continue
+            jobs.remove(job)
+            if jobs:
+                self._tenants.move_to_end(tenant)
+            else:
+                del self._tenants[tenant]
+            self._queued -= 1
+            self._running_conversations.add(job.conversation_id)
+            return job
+        return None
+
+    def _remember_finished(self, job):
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    async def _worker(self):
+        while True:
+            async with self._condition:
+                job = self._next_job()
+                while job is None:
+                    # The worker that finishes a conversation's job picks up its next one
+                    await self._condition.wait()
+                    job = self._next_job()
+
+            job.status = "running"
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                job.result = await self.handler(job)
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                self._running -= 1
+                self._running_conversations.discard(job.conversation_id)
+                job.finished_at = time.time()
+                job.done.set()
+                self._remember_finished(job)
@@ -0,0 +1,161 @@
+import time
+from collections import deque
+
+# Responses that move a request to another deployment
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+
+class NoHealthyDeploymentError(Exception):
+    """Raised when every deployment of the pool failed or is cooling down."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def error_status(error):
+    """
+    Find the HTTP status code and Retry-After of an error, following the exception chain
+    (semantic kernel wraps the openai errors, which carry the response).
+
+    Returns:
+    tuple: (status code or None, retry after in seconds or None)
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        if isinstance(status, int):
+            retry_after = None
+            headers = getattr(response, "headers", None) or {}
+            try:
+                retry_after = float(headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+            return status, retry_after
+        error = error.__cause__ or error.__context__
+    return None, None
+
+
+class Deployment:
+    def __init__(self, name, service_id, tokens_per_minute=None):
+        self.name = name
+        self.service_id = service_id
+        self.tokens_per_minute = tokens_per_minute
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.latency = None
+        self.cooldown_until = 0.0
+        self._tokens = deque()
+
+    def add_tokens(self, now, tokens):
+        self._tokens.append((now, tokens))
+
+    def tokens_last_minute(self, now):
+        while self._tokens and self._tokens[0][0] < now - 60:
+            self._tokens.popleft()
+        return sum(tokens for _, tokens in self._tokens)
+
+    def utilization(self, now):
+        if not self.tokens_per_minute:
+            return 0.0
+        return self.tokens_last_minute(now) / self.tokens_per_minute
+
+    def is_healthy(self, now):
+        return self.cooldown_until <= now
+
+    def stats(self, now):
+        return {
+            "service_id": self.service_id,
+            "healthy": self.is_healthy(now),
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "tokens_last_minute": self.tokens_last_minute(now),
+            "tokens_per_minute": self.tokens_per_minute,
+            "utilization": round(self.utilization(now), 3),
+            "avg_latency": round(self.latency, 3) if self.latency is not None else None,
+        }
+
+
+class DeploymentPool:
+    """
+    Routes chat completion calls to the least-loaded healthy deployment.
+
+    Load is the share of the deployment's tokens-per-minute quota used in the
+    last minute, then the number of calls in flight, then the average latency.
+    A deployment that answers with 429 or a server error cools down and the
+    call moves on to the next deployment.
+    """
+
+    def __init__(self, deployments, cooldown=30.0):
+        self.deployments = deployments
+        self.cooldown = cooldown
+
+    def choose(self, exclude=()):
+        now = time.monotonic()
+        candidates = [d for d in self.deployments if d.is_healthy(now) and d.name not in exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda d: (
+            min(d.utilization(now), 1.0), d.in_flight, d.latency or 0.0
+        ))
+
+    def record_success(self, deployment, latency, tokens=0):
+        deployment.latency = latency if deployment.latency is None else 0.8 * deployment.latency + 0.2 * latency
+        self.record_tokens(deployment, tokens)
+
+    def record_tokens(self, deployment, tokens):
+        """Count tokens against the deployment's quota, also for calls that failed after some rounds."""
+        if tokens:
+            deployment.add_tokens(time.monotonic(), tokens)
+
+    def record_failure(self, deployment, status, retry_after=None):
+        deployment.failures += 1
+        # Server errors are usually short, quota errors last until the window resets
+        cooldown = retry_after or (self.cooldown if status == 429 else self.cooldown / 3)
+        deployment.cooldown_until = time.monotonic() + cooldown
+
+    def _retry_after(self):
+        now = time.monotonic()
+        return max(1, int(min(d.cooldown_until for d in self.deployments) - now + 1))
+
+    async def run(self, call, tokens_of=None):
+        """
+        Run call(deployment) on the least-loaded deployment, failing over on retryable errors.
+
+        Args:
+        call: Coroutine function taking a Deployment.
+        tokens_of: Optional function returning the tokens used by a result.
+        """
+        tried = set()
+        while True:
+            deployment = self.choose(exclude=tried)
+            if deployment is None:
+                raise NoHealthyDeploymentError("No healthy LLM deployment available", self._retry_after())
+
+            tried.add(deployment.name)
+            deployment.in_flight += 1
+            deployment.requests += 1
+            started = time.monotonic()
+            try:
+                result = await call(deployment)
+            except Exception as e:
+                status, retry_after = error_status(e)
+                if status not in RETRYABLE_STATUS:
+                    raise
+                self.record_failure(deployment, status, retry_after)
+                print(f"LLM deployment {deployment.name} failed with {status}, failing over")
+                continue
+            finally:
+                deployment.in_flight -= 1
+
+            self.record_success(deployment, time.monotonic() - started, tokens_of(result) if tokens_of else 0)
+            return result
+
+    def stats(self):
+        now = time.monotonic()
+        return {d.name: d.stats(now) for d in self.deployments}
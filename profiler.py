@@ -0,0 +1,220 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+# Path fragments of the code that blocks or parses, used to tag samples
+HTML_PARSE_PATHS = (f"{os.sep}bs4{os.sep}",)
+BLOCKING_SYNC_PATHS = (f"{os.sep}requests{os.sep}", f"{os.sep}urllib3{os.sep}", f"{os.sep}http{os.sep}client.py",
+                       f"{os.sep}socket.py", f"{os.sep}ssl.py")
+IDLE_FUNCTIONS = (("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"))
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+def classify(frames):
+    """
+    Tag a stack (outermost frame first) as html-parse, blocking-sync, idle or python.
+    """
+    filenames = [filename for filename, _ in frames]
+    if any(path in filename for filename in filenames for path in HTML_PARSE_PATHS):
+        return "html-parse"
+    if any(path in filename for filename in filenames for path in BLOCKING_SYNC_PATHS):
+        return "blocking-sync"
+    if frames and (os.path.basename(frames[-1][0]), frames[-1][1]) in IDLE_FUNCTIONS:
+        return "idle"
+    return "python"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread from a background thread and aggregates them
+    as collapsed stacks ("root;category;frame;frame count"), ready for flamegraph.pl
+    or speedscope. The root is "event-loop" for the asyncio loop thread, so time spent
+    on the loop, blocking sync calls and BeautifulSoup parsing show up separately.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.loop_thread_id = None
+        self.last_capture = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._samples = Counter()
+        self._armed = 0
+        self._tracked = 0
+        self._capturing_requests = False
+        self._capture_on_exit = False
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._armed > 0 or self._capturing_requests:
+            raise ProfilerBusyError("A profile of the next requests is pending")
+        self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                raise ProfilerBusyError("A profile is already running")
+            self._samples = Counter()
+            self._capture_on_exit = False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return ""
+            self._stop.set()
+        thread.join()
+        with self._lock:
+            self._thread = None
+        return self.collapsed()
+
+    def profile(self, seconds):
+        """Blocking, samples for the given number of seconds and returns the collapsed stacks."""
+        self.start()
+        time.sleep(seconds)
+        return self.stop()
+
+    def arm(self, count):
+        """Profile the next count requests wrapped in track_request."""
+        if self.running:
+            raise ProfilerBusyError("A profile is already running")
+        self._armed = count
+        self.last_capture = None
+
+    @contextmanager
+    def track_request(self):
+        if self._armed <= 0:
+            yield
+            return
+
+        self._armed -= 1
+        self._tracked += 1
+        if not self.running:
+            self._start()
+            self._capturing_requests = True
+        try:
+            yield
+        finally:
+            self._tracked -= 1
+            if self._capturing_requests and self._tracked == 0 and self._armed == 0:
+                # Runs on the event loop, the sampler thread stores the capture itself instead
+                # of being joined here
+                self._capturing_requests = False
+                self._capture_on_exit = True
+                self._stop.set()
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self._samples.items()))
+
+    def status(self):
+        return {
+            "running": self.running,
+            "armed_requests": self._armed,
+            "tracked_requests": self._tracked,
+            "capture_ready": self.last_capture is not None,
+        }
+
+    def _stack(self, thread_id, frame, names):
+        frames = []
+        while frame is not None:
+            frames.append((frame.f_code.co_filename, frame.f_code.co_name))
+            frame = frame.f_back
+        frames.reverse()
+
+        if thread_id == self.loop_thread_id:
+            root = "event-loop"
+        else:
+            root = f"thread:{names.get(thread_id, thread_id)}"
+        labels = [f"{os.path.basename(filename)}:{name}" for filename, name in frames]
+        return ";".join(label.replace(";", ":") for label in [root, classify(frames), *labels])
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._samples[self._stack(thread_id, frame, names)] += 1
+
+        if self._capture_on_exit:
+            self.last_capture = self.collapsed()
+            with self._lock:
+                self._thread = None
+
+
+class LoopWatchdog:
+    """
+    Logs the stack of the event loop thread whenever the loop stops running
+    callbacks for longer than threshold seconds.
+    """
+
+    def __init__(self, threshold=0.5):
+        self.threshold = threshold
+        self.interval = max(threshold / 2, 0.05)
+        self.loop_thread_id = None
+        self.stalls = 0
+        self.longest_stall = 0.0
+        self.last_stack = None
+        self._last_beat = None
+        self._stop = threading.Event()
+        self._task = None
+        self._thread = None
+
+    def start(self):
+        """Must be called from the event loop thread."""
+        self.loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        stalled = False
+        while not self._stop.wait(self.interval):
+            lag = time.monotonic() - self._last_beat - self.interval
+            if lag <= self.threshold:
+                stalled = False
+                continue
+
+            self.longest_stall = max(self.longest_stall, lag)
+            if not stalled:
+                # Report every stall once, with the stack that is blocking the loop
+                stalled = True
+                self.stalls += 1
+                frame = sys._current_frames().get(self.loop_thread_id)
+                self.last_stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+                print(f"Event loop blocked for more than {lag:.2f}s:\n{self.last_stack}")
+
+    def stats(self):
+        return {
+            "threshold": self.threshold,
+            "stalls": self.stalls,
+            "longest_stall": round(self.longest_stall, 3),
+            "last_stack": self.last_stack,
+        }
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concurrency import AdmissionController, AdmissionRejected, KeyedLocks
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_rejects_when_line_is_full(self):
+        async def run():
+            controller = AdmissionController(limit=1, queue_timeout=1, max_waiting=0)
+            async with controller.admit():
+                with self.assertRaises(AdmissionRejected) as ctx:
+                    async with controller.admit():
+                        pass
+            return ctx.exception, controller.stats()
+
+        exc, stats = asyncio.run(run())
+        self.assertGreaterEqual(exc.retry_after, 1)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_rejects_after_queue_timeout(self):
+        async def run():
+            controller = AdmissionController(limit=1, queue_timeout=0.01, max_waiting=4)
+            async with controller.admit():
+                with self.assertRaises(AdmissionRejected):
+                    async with controller.admit():
+                        pass
+
+        asyncio.run(run())
+
+    def test_blocking_waits_for_slot(self):
+        async def run():
+            controller = AdmissionController(limit=1, queue_timeout=0.01, max_waiting=0)
+
+            async def hold():
+                async with controller.admit():
+                    await asyncio.sleep(0.05)
+
+            async def wait():
+                async with controller.admit(blocking=True):
+                    return "admitted"
+
+            _, result = await asyncio.gather(hold(), wait())
+            return result
+
+        self.assertEqual(asyncio.run(run()), "admitted")
+
+
+class TestKeyedLocks(unittest.TestCase):
+
+    def test_same_key_is_serialized(self):
+        async def run():
+            locks = KeyedLocks()
+            events = []
+
+            async def turn(name):
+                async with locks.lock("convo"):
+                    events.append(f"{name}-start")
+                    await asyncio.sleep(0.01)
+                    events.append(f"{name}-end")
+
+            await asyncio.gather(turn("a"), turn("b"))
+            return events, len(locks)
+
+        events, remaining = asyncio.run(run())
+        self.assertEqual(events, ["a-start", "a-end", "b-start", "b-end"])
+        self.assertEqual(remaining, 0)
+
+    def test_rejects_when_conversation_line_is_full(self):
+        async def run():
+            locks = KeyedLocks(timeout=1, max_waiting=1)
+
+            async def turn():
+                async with locks.lock("convo"):
+                    await asyncio.sleep(0.05)
+
+            holder = asyncio.create_task(turn())
+            waiter = asyncio.create_task(turn())
+            await asyncio.sleep(0.01)
+            with self.assertRaises(AdmissionRejected):
+                async with locks.lock("convo"):
+                    pass
+            # Job workers still get in line
+            async with locks.lock("convo", blocking=True):
+                pass
+            await asyncio.gather(holder, waiter)
+            return locks.stats()
+
+        stats = asyncio.run(run())
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["active_keys"], 0)
+
+    def test_rejects_after_conversation_timeout(self):
+        async def run():
+            locks = KeyedLocks(timeout=0.01)
+            async with locks.lock("convo"):
+                with self.assertRaises(AdmissionRejected):
+                    async with locks.lock("convo"):
+                        pass
+            return len(locks)
+
+        self.assertEqual(asyncio.run(run()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
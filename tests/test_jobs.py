@@ -0,0 +1,115 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobQueue, QueueFullError
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def test_job_result(self):
+        async def run():
+            async def handler(job):
+                return job.prompt.upper()
+
+            queue = JobQueue(handler, workers=2)
+            job = await queue.submit("tenant", "convo", "hello")
+            await asyncio.wait_for(job.done.wait(), timeout=1)
+            await queue.stop()
+            return job
+
+        job = asyncio.run(run())
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.result, "HELLO")
+
+    def test_failed_job(self):
+        async def run():
+            async def handler(job):
+                raise RuntimeError("boom")
+
+            queue = JobQueue(handler, workers=1)
+            job = await queue.submit("tenant", "convo", "hello")
+            await asyncio.wait_for(job.done.wait(), timeout=1)
+            await queue.stop()
+            return job
+
+        job = asyncio.run(run())
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "boom")
+
+    def test_tenants_are_served_round_robin(self):
+        async def run():
+            order = []
+
+            async def handler(job):
+                order.append(job.tenant)
+
+            queue = JobQueue(handler, workers=1)
+            jobs = [await queue.submit("a", "convo", str(i)) for i in range(3)]
+            jobs.append(await queue.submit("b", "convo", "0"))
+            await asyncio.wait_for(asyncio.gather(*(job.done.wait() for job in jobs)), timeout=1)
+            await queue.stop()
+            return order
+
+        self.assertEqual(asyncio.run(run()), ["a", "b", "a", "a"])
+
+    def test_max_depth(self):
+        async def run():
+            release = asyncio.Event()
+
+            async def handler(job):
+                await release.wait()
+
+            queue = JobQueue(handler, workers=1, max_depth=1)
+            await queue.submit("a", "convo", "running")
+            await asyncio.sleep(0)
+            await queue.submit("a", "convo", "queued")
+            with self.assertRaises(QueueFullError):
+                await queue.submit("a", "convo", "rejected")
+            release.set()
+            await queue.stop()
+
+        asyncio.run(run())
+
+    def test_max_tenant_depth(self):
+        async def run():
+            queue = JobQueue(lambda job: asyncio.sleep(0), workers=1, max_tenant_depth=1)
+            await queue.submit("a", "convo", "queued")
+            with self.assertRaises(QueueFullError):
+                await queue.submit("a", "convo", "rejected")
+            await queue.submit("b", "convo", "other tenant")
+            await queue.stop()
+
+        asyncio.run(run())
+
+    def test_busy_conversation_does_not_hold_workers(self):
+        async def run():
+            release = asyncio.Event()
+            started = []
+
+            async def handler(job):
+                started.append(job.prompt)
+                if job.prompt == "a-0":
+                    await release.wait()
+
+            queue = JobQueue(handler, workers=2)
+            jobs = [await queue.submit("a", "busy", f"a-{i}") for i in range(3)]
+            jobs.append(await queue.submit("b", "other", "b-0"))
+            for _ in range(5):
+                await asyncio.sleep(0)
+            waiting = list(started)
+            release.set()
+            await asyncio.wait_for(asyncio.gather(*(job.done.wait() for job in jobs)), timeout=1)
+            await queue.stop()
+            return waiting, started
+
+        waiting, started = asyncio.run(run())
+        self.assertEqual(waiting, ["a-0", "b-0"])
+        self.assertEqual(started, ["a-0", "b-0", "a-1", "a-2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import AsyncAzureOpenAI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_pool import (Deployment, DeploymentPool, NoHealthyDeploymentError, error_status)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    """Shaped like openai.APIStatusError."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers)
+
+
+class FakeEndpoints:
+    """Answers per deployment name with either a result or an error."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    async def __call__(self, deployment):
+        self.calls.append(deployment.name)
+        answer = self.answers[deployment.name]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class FakeAzureOpenAI(BaseHTTPRequestHandler):
+    """Local chat completions endpoint, the "east" deployment is over its quota."""
+
+    requests = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        deployment = self.path.split("/deployments/")[1].split("/")[0]
+        self.requests.append(deployment)
+        if deployment == "east":
+            self.reply(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}}, {"Retry-After": "20"})
+        else:
+            self.reply(200, {
+                "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+                "usage": {"prompt_tokens": 90, "completion_tokens": 10, "total_tokens": 100},
+            })
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_pool(*names, **kwargs):
+    return DeploymentPool([Deployment(name, f"function_calling-{name}", 1000) for name in names], **kwargs)
+
+
+class TestDeploymentPool(unittest.TestCase):
+
+    def test_fails_over_on_429(self):
+        pool = make_pool("east", "west")
+        endpoints = FakeEndpoints({"east": FakeAPIError(429, {"retry-after": "20"}), "west": "ok"})
+
+        result = asyncio.run(pool.run(endpoints))
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(endpoints.calls, ["east", "west"])
+        stats = pool.stats()
+        self.assertFalse(stats["east"]["healthy"])
+        self.assertGreater(stats["east"]["cooldown_remaining"], 10)
+        self.assertTrue(stats["west"]["healthy"])
+
+    def test_wrapped_error_status(self):
+        try:
+            try:
+                raise FakeAPIError(503)
+            except FakeAPIError as e:
+                raise RuntimeError("service failed") from e
+        except RuntimeError as e:
+            self.assertEqual(error_status(e), (503, None))
+
+    def test_non_retryable_error_is_raised(self):
+        pool = make_pool("east", "west")
+        endpoints = FakeEndpoints({"east": FakeAPIError(400), "west": "ok"})
+
+        with self.assertRaises(FakeAPIError):
+            asyncio.run(pool.run(endpoints))
+        self.assertEqual(endpoints.calls, ["east"])
+
+    def test_all_deployments_failing(self):
+        pool = make_pool("east", "west")
+        endpoints = FakeEndpoints({"east": FakeAPIError(429), "west": FakeAPIError(500)})
+
+        with self.assertRaises(NoHealthyDeploymentError) as ctx:
+            asyncio.run(pool.run(endpoints))
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+    def test_routes_to_least_loaded(self):
+        pool = make_pool("east", "west")
+        endpoints = FakeEndpoints({"east": "east", "west": "west"})
+
+        asyncio.run(pool.run(endpoints, tokens_of=lambda result: 900))
+        second = asyncio.run(pool.run(endpoints, tokens_of=lambda result: 100))
+
+        self.assertEqual(second, "west")
+        self.assertEqual(pool.stats()["east"]["utilization"], 0.9)
+
+    def test_tokens_of_failed_call_are_counted(self):
+        pool = make_pool("east", "west")
+
+        async def call(deployment):
+            # Two rounds of the tool loop went through before the deployment failed
+            pool.record_tokens(deployment, 300)
+            pool.record_tokens(deployment, 400)
+            if deployment.name == "east":
+                raise FakeAPIError(503)
+            return deployment.name
+
+        asyncio.run(pool.run(call))
+
+        stats = pool.stats()
+        self.assertEqual(stats["east"]["tokens_last_minute"], 700)
+        self.assertEqual(stats["west"]["tokens_last_minute"], 700)
+
+
+class TestDeploymentPoolOverHTTP(unittest.TestCase):
+
+    def setUp(self):
+        FakeAzureOpenAI.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAzureOpenAI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_fails_over_on_openai_429(self):
+        endpoint = f"http://127.0.0.1:{self.server.server_address[1]}"
+        pool = make_pool("east", "west")
+
+        async def run():
+            async def call(deployment):
+                # Built like the app builds the AzureChatCompletion clients
+                client = AsyncAzureOpenAI(azure_endpoint=endpoint, azure_deployment=deployment.name, api_key="key",
+                                          api_version="2024-06-01", max_retries=0)
+                try:
+                    return await client.chat.completions.create(
+                        model=deployment.name, messages=[{"role": "user", "content": "hi"}])
+                finally:
+                    await client.close()
+
+            return await pool.run(call, tokens_of=lambda result: result.usage.total_tokens)
+
+        result = asyncio.run(run())
+
+        self.assertEqual(result.choices[0].message.content, "ok")
+        self.assertEqual(FakeAzureOpenAI.requests, ["east", "west"])
+        stats = pool.stats()
+        self.assertFalse(stats["east"]["healthy"])
+        self.assertGreater(stats["east"]["cooldown_remaining"], 10)
+        self.assertEqual(stats["west"]["tokens_last_minute"], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import base64
+import difflib
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github_api.cache import GitHubCache
+from github_api.files import GitHubFile
+from github_api.patch import (apply_patch, apply_search_replace, apply_unified_diff, PatchConflictError)
+
+CONTENT = "import os\n\ndef main():\n    print('hello')\n\nmain()\n"
+
+
+class TestUnifiedDiff(unittest.TestCase):
+
+    def test_apply(self):
+        diff = (
+            "--- a/main.py\n"
+            "+++ b/main.py\n"
+            "@@ -3,2 +3,3 @@\n"
+            " def main():\n"
+            "-    print('hello')\n"
+            "+    print('hello world')\n"
+            "+    return 0\n"
+        )
+        patched, hunks = apply_unified_diff(CONTENT, diff)
+        self.assertEqual(patched, "import os\n\ndef main():\n    print('hello world')\n    return 0\n\nmain()\n")
+        self.assertEqual(hunks, 1)
+
+    def test_wrong_line_numbers(self):
+        diff = "@@ -40,1 +40,1 @@\n-main()\n+main()  # entry point\n"
+        patched, _ = apply_unified_diff(CONTENT, diff)
+        self.assertTrue(patched.endswith("main()  # entry point\n"))
+
+    def test_zero_context_insertion(self):
+        patched, _ = apply_patch("a\nb\nc\nd\n", "@@ -2,0 +3 @@\n+X\n")
+        self.assertEqual(patched, "a\nb\nX\nc\nd\n")
+
+    def test_zero_context_hunks_with_offset(self):
+        old = ["line %d" % i for i in range(1, 11)]
+        new = old[:1] + ["new 1", "new 2"] + old[1:4] + old[5:7] + ["new 3"] + old[7:]
+        diff = "".join(difflib.unified_diff([f"{line}\n" for line in old], [f"{line}\n" for line in new], n=0))
+        patched, hunks = apply_unified_diff("\n".join(old) + "\n", diff)
+        self.assertEqual(patched, "\n".join(new) + "\n")
+        self.assertEqual(hunks, 3)
+
+    def test_markdown_fence(self):
+        diff = (
+            "```diff\n"
+            "--- a/main.py\n"
+            "+++ b/main.py\n"
+            "@@ -4,1 +4,1 @@\n"
+            "-    print('hello')\n"
+            "+    print('hi')\n"
+            "```\n"
+            "This prints hi instead.\n"
+        )
+        patched, _ = apply_patch(CONTENT, diff)
+        self.assertEqual(patched, CONTENT.replace("hello", "hi"))
+
+    def test_second_file_is_rejected(self):
+        diff = (
+            "--- a/main.py\n+++ b/main.py\n@@ -4,1 +4,1 @@\n-    print('hello')\n+    print('hi')\n"
+            "diff --git a/other.py b/other.py\n--- a/other.py\n+++ b/other.py\n@@ -1,1 +1,1 @@\n-a\n+b\n"
+        )
+        with self.assertRaises(PatchConflictError):
+            apply_patch(CONTENT, diff)
+
+    def test_conflict(self):
+        diff = "@@ -4,1 +4,1 @@\n-    print('bye')\n+    print('hi')\n"
+        with self.assertRaises(PatchConflictError):
+            apply_unified_diff(CONTENT, diff)
+
+
+class TestSearchReplace(unittest.TestCase):
+
+    def test_apply(self):
+        patch = "<<<<<<< SEARCH\n    print('hello')\n=======\n    print('hi')\n>>>>>>> REPLACE\n"
+        patched, edits = apply_patch(CONTENT, patch)
+        self.assertIn("print('hi')", patched)
+        self.assertEqual(edits, 1)
+
+    def test_ambiguous_search(self):
+        patch = "<<<<<<< SEARCH\nmain\n=======\nrun\n>>>>>>> REPLACE\n"
+        with self.assertRaises(PatchConflictError):
+            apply_search_replace(CONTENT, patch)
+
+    def test_missing_search(self):
+        patch = "<<<<<<< SEARCH\nimport sys\n=======\nimport re\n>>>>>>> REPLACE\n"
+        with self.assertRaises(PatchConflictError):
+            apply_search_replace(CONTENT, patch)
+
+
+def file_response(content, sha):
+    return {"content": base64.b64encode(content.encode("utf-8")).decode("ascii"), "sha": sha}
+
+
+def conflict_error():
+    return requests.exceptions.HTTPError("409 Conflict", response=MagicMock(status_code=409))
+
+
+@patch.dict(os.environ, {"GITHUB_TOKEN_GEN_AI": "token"})
+class TestGitHubFileApplyPatch(unittest.TestCase):
+
+    PATCH = "<<<<<<< SEARCH\n    print('hello')\n=======\n    print('hi')\n>>>>>>> REPLACE\n"
+
+    def setUp(self):
+        cache_patcher = patch('github_api.files.github_cache', GitHubCache(ttl=60))
+        self.cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+    @patch('github_api.files.make_github_request')
+    def test_stale_cache_retries_with_fresh_read(self, mock_request):
+        # The cached blob is older than the file on GitHub and the patch does not apply to it
+        stale = CONTENT.replace("main", "run").replace("print('hello')", "print('bye')")
+        self.cache.set("content", "owner", "repo", "main", "main.py", {"content": stale, "sha": "old"})
+
+        def request(method, url, headers, data=None):
+            if method == "GET":
+                return file_response(CONTENT, "fresh")
+            return {"commit": {"sha": "abc123"}}
+
+        mock_request.side_effect = request
+        result = GitHubFile("owner", "repo").apply_patch("main.py", self.PATCH, "Say hi")
+
+        self.assertEqual(result, "Applied 1 edit(s) to main.py in commit abc123")
+        method, _, _, data = mock_request.call_args.args
+        self.assertEqual(method, "PUT")
+        self.assertEqual(data["sha"], "fresh")
+        self.assertEqual(base64.b64decode(data["content"]).decode("utf-8"), CONTENT.replace("hello", "hi"))
+
+    @patch('github_api.files.make_github_request')
+    def test_commit_conflict_is_reported(self, mock_request):
+        self.cache.set("content", "owner", "repo", "main", "main.py", {"content": CONTENT, "sha": "old"})
+
+        def request(method, url, headers, data=None):
+            if method == "GET":
+                return file_response(CONTENT, "fresh")
+            raise conflict_error()
+
+        mock_request.side_effect = request
+        result = GitHubFile("owner", "repo").apply_patch("main.py", self.PATCH, "Say hi")
+
+        self.assertIn("Patch conflict in main.py", result)
+        self.assertEqual([call.args[0] for call in mock_request.call_args_list], ["PUT", "GET", "PUT"])
+        self.assertIsNone(self.cache.get("content", "owner", "repo", "main", "main.py"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github_api.prefetch import (SessionPrefetcher, rank_candidates)
+
+TREE = [
+    "README.md",
+    "app.py",
+    "requirements.txt",
+    ".github/workflows/run-tests.yml",
+    "src/utils/helpers.py",
+    "src/vendor/lib/app.py",
+    "docs/index.md",
+]
+
+
+def fake_get_file(path, branch="main"):
+    return {"content": f"content of {path}", "sha": "sha"}
+
+
+def wait_for_fetches(prefetcher):
+    # The fetches run on the shared executor, let them finish while GitHubFile is still patched
+    for entry in list(prefetcher._entries.values()):
+        try:
+            entry.future.result(timeout=1)
+        except Exception:
+            pass
+
+
+class TestRankCandidates(unittest.TestCase):
+
+    def test_order(self):
+        candidates = rank_candidates(TREE, "Fix the bug in helpers.py please.")
+        self.assertEqual(candidates, [
+            "src/utils/helpers.py",
+            ".github/workflows/run-tests.yml",
+            "app.py",
+            "requirements.txt",
+        ])
+
+    def test_max_files(self):
+        self.assertEqual(len(rank_candidates(TREE, "", max_files=2)), 2)
+
+
+class TestSessionPrefetcher(unittest.TestCase):
+
+    @patch('github_api.prefetch.GitHubFile')
+    def test_hits_and_misses(self, mock_github_file):
+        mock_github_file.return_value.get_file.side_effect = fake_get_file
+        prefetcher = SessionPrefetcher()
+        prefetcher.add_hints("look at helpers.py")
+        prefetcher.prefetch_tree("owner", "repo", TREE)
+        wait_for_fetches(prefetcher)
+
+        self.assertEqual(prefetcher.get("owner", "repo", "src/utils/helpers.py")["content"],
+                         "content of src/utils/helpers.py")
+        self.assertIsNone(prefetcher.get("owner", "repo", "docs/index.md"))
+
+        stats = prefetcher.stats()
+        self.assertEqual(stats["prefetched_files"], 4)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertGreater(stats["wasted_bytes"], 0)
+
+    @patch('github_api.prefetch.GitHubFile')
+    def test_byte_budget(self, mock_github_file):
+        mock_github_file.return_value.get_file.side_effect = fake_get_file
+        prefetcher = SessionPrefetcher(max_bytes=30)
+        prefetcher.prefetch("owner", "repo", ["app.py", "requirements.txt"])
+        wait_for_fetches(prefetcher)
+        prefetcher.get("owner", "repo", "app.py")
+        prefetcher.get("owner", "repo", "requirements.txt")
+
+        stats = prefetcher.stats()
+        self.assertLessEqual(stats["bytes"], 30)
+        self.assertEqual(stats["skipped"], 1)
+
+    @patch('github_api.prefetch.GitHubFile')
+    def test_discard_after_write(self, mock_github_file):
+        mock_github_file.return_value.get_file.side_effect = fake_get_file
+        prefetcher = SessionPrefetcher()
+        prefetcher.prefetch("owner", "repo", ["app.py"])
+        prefetcher.get("owner", "repo", "app.py")
+        prefetcher.discard("owner", "repo", "app.py")
+
+        self.assertIsNone(prefetcher.get("owner", "repo", "app.py"))
+        self.assertEqual(prefetcher.stats()["bytes"], 0)
+
+    @patch('github_api.prefetch.GitHubFile')
+    def test_discard_during_fetch(self, mock_github_file):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_get_file(path, branch="main"):
+            started.set()
+            release.wait(1)
+            return fake_get_file(path, branch)
+
+        mock_github_file.return_value.get_file.side_effect = slow_get_file
+        prefetcher = SessionPrefetcher()
+        prefetcher.prefetch("owner", "repo", ["app.py"])
+        future = prefetcher._entries[("owner", "repo", "app.py")].future
+        started.wait(1)
+        prefetcher.discard("owner", "repo", "app.py")
+        release.set()
+        future.result(timeout=1)
+
+        self.assertIsNone(prefetcher.get("owner", "repo", "app.py"))
+        self.assertEqual(prefetcher.stats()["bytes"], 0)
+        self.assertEqual(prefetcher.stats()["prefetched_files"], 0)
+
+    @patch('github_api.prefetch.GitHubFile')
+    def test_invalidate(self, mock_github_file):
+        mock_github_file.return_value.get_file.side_effect = fake_get_file
+        prefetcher = SessionPrefetcher()
+        prefetcher.prefetch("owner", "repo", ["app.py", "requirements.txt"])
+        wait_for_fetches(prefetcher)
+        prefetcher.get("owner", "repo", "app.py")
+
+        prefetcher.invalidate("owner", "repo", kind="tree", ref="main")
+        prefetcher.invalidate("owner", "repo", kind="content", ref="dev")
+        self.assertIsNotNone(prefetcher.get("owner", "repo", "app.py"))
+
+        prefetcher.invalidate("Owner", "Repo", kind="content", ref="main", path="app.py")
+        self.assertIsNone(prefetcher.get("owner", "repo", "app.py"))
+        prefetcher.invalidate("owner", "repo")
+        self.assertIsNone(prefetcher.get("owner", "repo", "requirements.txt"))
+        self.assertEqual(prefetcher.stats()["bytes"], 0)
+
+    @patch('github_api.prefetch.GitHubFile')
+    def test_expiry(self, mock_github_file):
+        mock_github_file.return_value.get_file.side_effect = fake_get_file
+        prefetcher = SessionPrefetcher(max_age=0.01)
+        prefetcher.prefetch("owner", "repo", ["app.py"])
+        wait_for_fetches(prefetcher)
+        time.sleep(0.02)
+
+        self.assertIsNone(prefetcher.get("owner", "repo", "app.py"))
+        stats = prefetcher.stats()
+        self.assertEqual(stats["expired"], 1)
+        self.assertEqual(stats["bytes"], 0)
+
+        # Fetched again on the next listing
+        prefetcher.max_age = 60
+        prefetcher.prefetch("owner", "repo", ["app.py"])
+        self.assertIsNotNone(prefetcher.get("owner", "repo", "app.py"))
+
+    @patch('github_api.prefetch.GitHubFile')
+    def test_failed_fetch_is_retried(self, mock_github_file):
+        mock_github_file.return_value.get_file.side_effect = [RuntimeError("502 Bad Gateway"), fake_get_file("app.py")]
+        prefetcher = SessionPrefetcher()
+        prefetcher.prefetch("owner", "repo", ["app.py"])
+        wait_for_fetches(prefetcher)
+
+        self.assertEqual(prefetcher.stats()["skipped"], 1)
+        self.assertNotIn(("owner", "repo", "app.py"), prefetcher._entries)
+
+        prefetcher.prefetch("owner", "repo", ["app.py"])
+        wait_for_fetches(prefetcher)
+        self.assertEqual(prefetcher.get("owner", "repo", "app.py")["content"], "content of app.py")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import (LoopWatchdog, ProfilerBusyError, SamplingProfiler, classify)
+
+
+def busy_work(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_profile_collects_collapsed_stacks(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_work, args=(stop,), name="busy")
+        worker.start()
+        try:
+            collapsed = SamplingProfiler(interval=0.005).profile(0.1)
+        finally:
+            stop.set()
+            worker.join()
+
+        lines = [line for line in collapsed.splitlines() if line.startswith("thread:busy;python;")]
+        self.assertTrue(lines)
+        self.assertTrue(all("test_profiler.py:busy_work" in line for line in lines))
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+
+    def test_busy_profiler(self):
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            with self.assertRaises(ProfilerBusyError):
+                profiler.start()
+        finally:
+            profiler.stop()
+
+    def test_track_requests(self):
+        profiler = SamplingProfiler(interval=0.005)
+        profiler.arm(2)
+        for _ in range(2):
+            with profiler.track_request():
+                time.sleep(0.02)
+        with profiler.track_request():
+            pass
+
+        deadline = time.monotonic() + 1
+        while profiler.last_capture is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn("test_profiler.py:test_track_requests", profiler.last_capture)
+
+    def test_profile_refused_while_requests_are_armed(self):
+        profiler = SamplingProfiler(interval=0.005)
+        profiler.arm(1)
+        with self.assertRaises(ProfilerBusyError):
+            profiler.profile(0.01)
+        self.assertFalse(profiler.running)
+
+    def test_classify(self):
+        requests_frame = (os.path.join("site-packages", "requests", "api.py"), "get")
+        bs4_frame = (os.path.join("site-packages", "bs4", "__init__.py"), "__init__")
+        idle_frame = (os.path.join("lib", "selectors.py"), "select")
+        self.assertEqual(classify([("app.py", "handler"), requests_frame]), "blocking-sync")
+        self.assertEqual(classify([("fetchurl.py", "get_content_from_url"), bs4_frame]), "html-parse")
+        self.assertEqual(classify([("base_events.py", "run_forever"), idle_frame]), "idle")
+
+
+class TestLoopWatchdog(unittest.TestCase):
+
+    def test_detects_blocked_loop(self):
+        async def run():
+            watchdog = LoopWatchdog(threshold=0.1)
+            watchdog.start()
+            await asyncio.sleep(0.1)
+            time.sleep(0.5)  # Blocks the loop
+            await asyncio.sleep(0.1)
+            watchdog.stop()
+            return watchdog
+
+        watchdog = asyncio.run(run())
+        self.assertEqual(watchdog.stalls, 1)
+        self.assertIn("test_detects_blocked_loop", watchdog.last_stack)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_selection import (CORE_TOOLS, TOOL_GROUPS, ToolSelector, serialize_schema)
+
+
+def make_selector():
+    names = set(CORE_TOOLS)
+    for group in TOOL_GROUPS.values():
+        names.update(group["tools"])
+    schemas = {
+        name: serialize_schema(f"githubapi-{name}", f"{name} description", [("repo_owner", {"type": "string"}, True)])
+        for name in names
+    }
+    return ToolSelector(schemas)
+
+
+class TestToolSelector(unittest.TestCase):
+
+    def test_core_tools_only(self):
+        selector = make_selector()
+        self.assertEqual(selector.select("hello"), sorted(CORE_TOOLS))
+
+    def test_keyword_groups(self):
+        selector = make_selector()
+        selected = selector.select("Why does the CI workflow of my repo keep failing?")
+        self.assertIn("github_get_actions_results", selected)
+        self.assertNotIn("extract_image_urls", selected)
+        self.assertNotIn("github_list_repositories", selected)
+
+    def test_recent_tools_stay_selected(self):
+        selector = make_selector()
+        selected = selector.select("and now?", recent_tools=["get_readme_from_github"])
+        self.assertIn("get_readme_from_github", selected)
+
+    def test_repository_prompt_offers_edit_tools(self):
+        selector = make_selector()
+        selected = selector.select("Look at owner/repo, test_utils.py is broken, make the tests pass")
+        self.assertIn("github_apply_patch", selected)
+        self.assertIn("github_push", selected)
+        self.assertIn("github_get_actions_results", selected)
+
+    def test_stats_report_savings(self):
+        selector = make_selector()
+        selected = selector.select("hello")
+        selector.record_requests(selected, requests=3)
+        stats = selector.stats()
+        self.assertEqual(stats["turns"], 1)
+        self.assertEqual(stats["requests"], 3)
+        self.assertGreater(stats["schema_tokens_saved"], 0)
+        self.assertEqual(stats["schema_tokens_sent"] + stats["schema_tokens_saved"],
+                         3 * stats["schema_tokens_all_tools"])
+
+
+if __name__ == '__main__':
+    unittest.main()
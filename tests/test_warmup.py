@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+client = TestClient(app_module.app)
+
+
+def reset():
+    app_module.kernel = None
+    app_module.tool_selector = None
+    app_module.warmup.update({"status": "pending", "seconds": None, "error": None})
+
+
+@patch.dict(os.environ, {"TOOL_SELECTION": "off"})
+@patch('app.importlib.import_module')
+class TestWarmUp(unittest.TestCase):
+
+    def setUp(self):
+        reset()
+
+    def tearDown(self):
+        reset()
+
+    @patch('app.build_kernel')
+    def test_ready_after_warm_up(self, mock_build_kernel, mock_import_module):
+        mock_build_kernel.return_value = MagicMock()
+        self.assertEqual(client.get("/ready").status_code, 503)
+
+        asyncio.run(app_module.warm_up())
+
+        response = client.get("/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "ready")
+        self.assertIsNotNone(response.json()["seconds"])
+
+    @patch('app.build_kernel')
+    def test_failed_warm_up(self, mock_build_kernel, mock_import_module):
+        mock_build_kernel.side_effect = ValueError("AZURE_OPENAI_API_KEY is not set.")
+
+        asyncio.run(app_module.warm_up())
+
+        response = client.get("/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "failed")
+        self.assertIn("AZURE_OPENAI_API_KEY", response.json()["error"])
+
+    @patch('app.build_kernel')
+    def test_kernel_is_built_once(self, mock_build_kernel, mock_import_module):
+        def slow_build():
+            time.sleep(0.05)
+            return MagicMock()
+
+        mock_build_kernel.side_effect = slow_build
+
+        async def run():
+            return await asyncio.gather(*(app_module.get_kernel() for _ in range(5)))
+
+        kernels = asyncio.run(run())
+        self.assertEqual(mock_build_kernel.call_count, 1)
+        self.assertTrue(all(kernel is kernels[0] for kernel in kernels))
+
+
+if __name__ == '__main__':
+    unittest.main()
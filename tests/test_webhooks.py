@@ -0,0 +1,107 @@
+import hashlib
+import hmac
+import json
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from github_api.cache import (GitHubCache, resolve_cache_ttl)
+from webhooks import (InvalidPayloadError, handle_event, verify_signature)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "github_webhooks")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, f"{name}.json"), "rb") as f:
+        return f.read()
+
+
+def filled_cache():
+    cache = GitHubCache(ttl=60)
+    cache.set("tree", "KostaMalsev", "demo-repo", "main", None, ["utils.py", "app.py"])
+    cache.set("content", "KostaMalsev", "demo-repo", "main", "utils.py", {"content": "old", "sha": "1"})
+    cache.set("content", "KostaMalsev", "demo-repo", "main", "app.py", {"content": "app", "sha": "2"})
+    cache.set("content", "KostaMalsev", "demo-repo", "feature/fix-tests", "app.py", {"content": "app", "sha": "3"})
+    cache.set("artifact", "KostaMalsev", "demo-repo", None, "SummaryResult", "All tests passed")
+    return cache
+
+
+class TestSignature(unittest.TestCase):
+
+    def test_valid_signature(self):
+        body = load_fixture("push")
+        signature = "sha256=" + hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+        self.assertTrue(verify_signature("secret", body, signature))
+
+    def test_invalid_signature(self):
+        body = load_fixture("push")
+        signature = "sha256=" + hmac.new(b"other", body, hashlib.sha256).hexdigest()
+        self.assertFalse(verify_signature("secret", body, signature))
+        self.assertFalse(verify_signature("secret", body, ""))
+
+
+class TestEvents(unittest.TestCase):
+
+    def test_push(self):
+        cache = filled_cache()
+        result = handle_event("push", json.loads(load_fixture("push")), cache)
+
+        self.assertEqual(result["invalidated"], 2)
+        self.assertIsNone(cache.get("tree", "KostaMalsev", "demo-repo", "main"))
+        self.assertIsNone(cache.get("content", "KostaMalsev", "demo-repo", "main", "utils.py"))
+        self.assertIsNotNone(cache.get("content", "KostaMalsev", "demo-repo", "main", "app.py"))
+        self.assertIsNotNone(cache.get("artifact", "KostaMalsev", "demo-repo", None, "SummaryResult"))
+        self.assertEqual(
+            [(target["kind"], target.get("path")) for target in result["prewarm"]],
+            [("tree", None), ("content", "README.md"), ("content", "tests/test_utils.py"), ("content", "utils.py")],
+        )
+
+    def test_push_reaches_listeners(self):
+        cache = GitHubCache(ttl=60)
+        invalidated = []
+        cache.add_invalidation_listener(lambda *args: invalidated.append(args))
+        handle_event("push", json.loads(load_fixture("push")), cache)
+
+        # Listeners hear about every changed path, cached here or not
+        self.assertIn(("kostamalsev", "demo-repo", "content", "main", "utils.py"), invalidated)
+        self.assertIn(("kostamalsev", "demo-repo", "content", "main", "README.md"), invalidated)
+
+    def test_delete_branch(self):
+        cache = filled_cache()
+        result = handle_event("delete", json.loads(load_fixture("delete")), cache)
+
+        self.assertEqual(result["invalidated"], 1)
+        self.assertIsNone(cache.get("content", "KostaMalsev", "demo-repo", "feature/fix-tests", "app.py"))
+        self.assertIsNotNone(cache.get("content", "KostaMalsev", "demo-repo", "main", "app.py"))
+
+    def test_workflow_run(self):
+        cache = filled_cache()
+        result = handle_event("workflow_run", json.loads(load_fixture("workflow_run")), cache)
+
+        self.assertEqual(result["invalidated"], 1)
+        self.assertIsNone(cache.get("artifact", "KostaMalsev", "demo-repo", None, "SummaryResult"))
+
+    def test_invalid_payload(self):
+        cache = filled_cache()
+        for payload in ([], {"ref": "refs/heads/main"}, {"repository": {"full_name": None}}):
+            with self.assertRaises(InvalidPayloadError):
+                handle_event("push", payload, cache)
+        self.assertIsNotNone(cache.get("tree", "KostaMalsev", "demo-repo", "main"))
+
+    def test_ignored_event(self):
+        result = handle_event("ping", {"zen": "Keep it logically awesome."}, filled_cache())
+        self.assertTrue(result["ignored"])
+
+
+class TestCacheTTL(unittest.TestCase):
+
+    def test_cache_is_off_without_webhook(self):
+        self.assertEqual(resolve_cache_ttl(None, None), 0)
+        self.assertEqual(resolve_cache_ttl("", "secret"), 60)
+        self.assertEqual(resolve_cache_ttl("5", None), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
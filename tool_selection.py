@@ -0,0 +1,127 @@
+import json
+import re
+
+# Tools that are offered on every turn
+CORE_TOOLS = ("github_list_files", "github_get", "check_credentials_to_github")
+
+# Tool groups offered when one of their keywords (word prefix) shows up in the conversation
+TOOL_GROUPS = {
+    "edit": {
+        "keywords": ("fix", "change", "edit", "updat", "creat", "add", "delet", "remov", "renam", "mov",
+                     "push", "patch", "bug", "error", "broke", "refactor", "write", "file", "director", "folder"),
+        "tools": ("github_apply_patch", "github_push", "github_create_file", "github_delete_file",
+                  "github_rename_file", "github_rename_directory", "github_create_directory"),
+    },
+    "actions": {
+        "keywords": ("action", "workflow", "ci", "test", "build", "pipeline", "fail"),
+        "tools": ("github_get_actions_results", "create_github_action", "github_update_action"),
+    },
+    "readme": {
+        "keywords": ("readme", "doc", "documentation"),
+        "tools": ("get_readme_from_github", "update_readme_on_github", "github_create_readme_file"),
+    },
+    "web": {
+        "keywords": ("http", "url", "www", "link", "page", "website", "web", "image", "fetch"),
+        "tools": ("github_get_html_content_from_url", "github_get_text_content_from_url", "extract_image_urls"),
+    },
+    "repositories": {
+        "keywords": ("repositories", "repos", "projects"),
+        "tools": ("github_list_repositories",),
+    },
+}
+
+# Work on a repository (owner/repo, "the repo") usually ends in a change, whatever the wording,
+# so these groups are offered whenever the conversation names one
+REPO_PATTERN = re.compile(r"\b[\w.-]+/[\w.-]+|\brepo(?:sitory)?\b")
+REPO_GROUPS = ("edit",)
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for JSON schemas
+    return (len(text) + 3) // 4
+
+
+def serialize_schema(name, description, parameters):
+    """
+    Serialize one function schema the way it is sent to the model, used for token estimates.
+
+    Args:
+    parameters (list): (name, json schema dict, is required) tuples.
+    """
+    return json.dumps({
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {param: schema for param, schema, _ in parameters},
+                "required": [param for param, _, required in parameters if required],
+            },
+        },
+    }, separators=(",", ":"))
+
+
+class ToolSelector:
+    """
+    Picks the subset of tools offered to the model on a turn, from the prompt,
+    the recent conversation and the tools the conversation used recently.
+    """
+
+    def __init__(self, schemas, core=CORE_TOOLS, groups=TOOL_GROUPS, repo_groups=REPO_GROUPS, recent_limit=5):
+        """
+        Args:
+        schemas (dict): Tool name to serialized schema, computed once when the kernel is built.
+        recent_limit (int): Number of recently used tools that stay selected.
+        """
+        self.schemas = schemas
+        self.core = core
+        self.groups = groups
+        self.repo_groups = repo_groups
+        self.recent_limit = recent_limit
+        self._tokens = {name: estimate_tokens(schema) for name, schema in schemas.items()}
+        self._total_tokens = sum(self._tokens.values())
+        self._turns = 0
+        self._requests = 0
+        self._sent_tokens = 0
+        self._saved_tokens = 0
+
+    def select(self, prompt, history=(), recent_tools=()):
+        """
+        Returns:
+        list: Sorted names of the selected tools.
+        """
+        text = " ".join([prompt, *history]).lower()
+        words = set(re.findall(r"[a-z]+", text))
+
+        selected = set(self.core)
+        if self.recent_limit:
+            selected.update(recent_tools[-self.recent_limit:])
+        names_repo = REPO_PATTERN.search(text) is not None
+        for name, group in self.groups.items():
+            matches_keyword = any(word.startswith(keyword) for keyword in group["keywords"] for word in words)
+            if matches_keyword or (names_repo and name in self.repo_groups):
+                selected.update(group["tools"])
+        selected &= set(self.schemas)
+
+        self._turns += 1
+        return sorted(selected)
+
+    def record_requests(self, selected, requests=1):
+        """Count the schema tokens of the chat completion requests sent with a selection, one per tool-loop round."""
+        sent = sum(self._tokens.get(name, 0) for name in selected)
+        self._requests += requests
+        self._sent_tokens += sent * requests
+        self._saved_tokens += (self._total_tokens - sent) * requests
+
+    def stats(self):
+        return {
+            "tools": len(self.schemas),
+            "schema_tokens_all_tools": self._total_tokens,
+            "turns": self._turns,
+            "requests": self._requests,
+            # Summed over every chat completion request, each tool-loop round sends the schemas again
+            "schema_tokens_sent": self._sent_tokens,
+            "schema_tokens_saved": self._saved_tokens,
+            "avg_schema_tokens_saved_per_turn": round(self._saved_tokens / self._turns, 1) if self._turns else 0,
+        }
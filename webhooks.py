@@ -0,0 +1,120 @@
+import hashlib
+import hmac
+
+# Number of changed files of a push that are fetched again in the background
+MAX_PREWARM_FILES = 20
+
+# GitHub sends at most 20 commits in a push payload, with more the changed paths are incomplete
+MAX_PUSH_COMMITS = 20
+
+
+class InvalidPayloadError(ValueError):
+    """Raised when a delivery is not the payload of the GitHub event it claims to be."""
+
+
+def verify_signature(secret, body, signature_header):
+    """
+    Check the X-Hub-Signature-256 header of a GitHub webhook delivery.
+
+    Args:
+    secret (str): The webhook secret configured on GitHub.
+    body (bytes): The raw request body.
+    signature_header (str): Value of the X-Hub-Signature-256 header ("sha256=<hex digest>").
+    """
+    if not secret or not signature_header or not signature_header.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len("sha256="):])
+
+
+def _repository(payload):
+    owner, _, repo = payload["repository"]["full_name"].partition("/")
+    return owner, repo
+
+
+def _branch(ref):
+    return ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else None
+
+
+def handle_push(payload, cache):
+    owner, repo = _repository(payload)
+    branch = _branch(payload.get("ref", ""))
+    result = {"invalidated": 0, "prewarm": []}
+    if branch is None:
+        return result  # Tag pushes do not touch cached branches
+
+    changed, removed = set(), set()
+    commits = payload.get("commits") or []
+    for commit in commits:
+        changed.update(commit.get("added", []))
+        changed.update(commit.get("modified", []))
+        removed.update(commit.get("removed", []))
+    changed -= removed
+
+    invalidated = cache.invalidate(owner, repo, kind="tree", ref=branch)
+    if payload.get("forced") or payload.get("deleted") or len(commits) >= MAX_PUSH_COMMITS:
+        # The payload does not list every changed path, drop the whole branch
+        invalidated += cache.invalidate(owner, repo, kind="content", ref=branch)
+    else:
+        for path in changed | removed:
+            invalidated += cache.invalidate(owner, repo, kind="content", ref=branch, path=path)
+    result["invalidated"] = invalidated
+
+    if not payload.get("deleted"):
+        result["prewarm"].append({"kind": "tree", "owner": owner, "repo": repo, "ref": branch})
+        for path in sorted(changed)[:MAX_PREWARM_FILES]:
+            result["prewarm"].append({"kind": "content", "owner": owner, "repo": repo, "ref": branch, "path": path})
+    return result
+
+
+def handle_delete(payload, cache):
+    owner, repo = _repository(payload)
+    if payload.get("ref_type") != "branch":
+        return {"invalidated": 0, "prewarm": []}
+    return {"invalidated": cache.invalidate(owner, repo, ref=payload["ref"]), "prewarm": []}
+
+
+def handle_workflow_run(payload, cache):
+    owner, repo = _repository(payload)
+    if payload.get("action") != "completed":
+        return {"invalidated": 0, "prewarm": []}
+    # A finished run uploads new artifacts, e.g. the SummaryResult of the test workflow
+    return {"invalidated": cache.invalidate(owner, repo, kind="artifact"), "prewarm": []}
+
+
+def validate_payload(payload):
+    """Check the shape of the payload fields the handlers read, before anything is invalidated."""
+    if not isinstance(payload, dict):
+        raise InvalidPayloadError("The payload is not a JSON object")
+    repository = payload.get("repository")
+    full_name = repository.get("full_name") if isinstance(repository, dict) else None
+    if not isinstance(full_name, str) or "/" not in full_name:
+        raise InvalidPayloadError("The payload has no repository.full_name")
+    if not isinstance(payload.get("ref", ""), str):
+        raise InvalidPayloadError("ref is not a string")
+    commits = payload.get("commits") or []
+    if not isinstance(commits, list) or not all(isinstance(commit, dict) for commit in commits):
+        raise InvalidPayloadError("commits is not a list of objects")
+
+
+EVENT_HANDLERS = {
+    "push": handle_push,
+    "delete": handle_delete,
+    "workflow_run": handle_workflow_run,
+}
+
+
+def handle_event(event, payload, cache):
+    """
+    Invalidate the cache entries touched by a GitHub webhook event.
+
+    Raises InvalidPayloadError for a handled event whose payload does not have the expected shape.
+
+    Returns:
+    dict: The event name, the number of invalidated entries and the entries to pre-warm.
+    """
+    handler = EVENT_HANDLERS.get(event)
+    if handler is None:
+        return {"event": event, "ignored": True, "invalidated": 0, "prewarm": []}
+    validate_payload(payload)
+    return {"event": event, "ignored": False, **handler(payload, cache)}